@@ -3,23 +3,31 @@
 # This file only contains a selection of the most common options. For a full
 # list see the documentation:
 # https://www.sphinx-doc.org/en/master/usage/configuration.html
+#
+# Every extension below declares itself parallel-safe: the sphinx.ext.* ones,
+# IPython.sphinxext.* (IPython 9), sphinx_copybutton (0.5.2) and myst_nb (1.4)
+# for both reading and writing, sphinxemoji (0.3.2) for reading, with writing
+# left at Sphinx's default of safe. Builds can therefore run with:
+#   sphinx-build -j auto -b html . _build/html
 
 # -- REQUIREMENTS -----------------------------------------------------
 # pip install sphinx-material
 # pip install sphinxemoji
 
-import datetime
 import os
-import re
 import sys
-import asyncio
-import platform
 
-sys.path.insert(0, os.path.abspath("../"))
+sys.path.insert(0, os.path.abspath("../../src"))
 # -- Project information
 
 project = 'PyUMLS-Similarity'
-copyright = '2023, Victor M. Murcia'
+# Baked in at release time so conf.py stays identical between local builds
+# (a changing value invalidates Sphinx's incremental cache). CI can opt into
+# the current year with SPHINX_DYNAMIC_YEAR=1.
+copyright = '2023-2024, Victor M. Murcia'
+if os.environ.get("SPHINX_DYNAMIC_YEAR"):
+    import datetime
+    copyright = f'2023-{datetime.date.today().year}, Victor M. Murcia'
 author = 'Victor M. Murcia'
 
 release = '0.1'
@@ -43,10 +51,14 @@ extensions = [
     "myst_nb",
 ]
 
+# Local inventories (see ``make inventories``) are tried first; the remote
+# objects.inv is only fetched when the local copy is missing.
 intersphinx_mapping = {
-    'python': ('https://docs.python.org/3/', None),
-    'sphinx': ('https://www.sphinx-doc.org/en/master/', None),
+    'python': ('https://docs.python.org/3/', ('_inventories/python.inv', None)),
+    'sphinx': ('https://www.sphinx-doc.org/en/master/', ('_inventories/sphinx.inv', None)),
 }
+intersphinx_cache_limit = 90  # days to keep remote inventories cached
+intersphinx_timeout = 10
 intersphinx_disabled_domains = ['std']
 
 templates_path = ['_templates']
@@ -66,6 +78,9 @@ napoleon_use_param = False
 napoleon_use_ivar = False
 napoleon_use_rtype = False
 add_module_names = False  # If true, the current module name will be prepended to all description
+# Runtime dependencies are not needed to read signatures/docstrings
+autodoc_mock_imports = ["pandas", "tqdm"]
+autodoc_default_options = {"members": True, "undoc-members": False}
 
 # -- Options for HTML output
 
@@ -73,3 +88,14 @@ html_theme = 'sphinx_rtd_theme'
 
 # -- Options for EPUB output
 epub_show_urls = 'footnote'
+
+# -- Config cache guard
+# Sphinx silently drops unpicklable config values from its environment cache,
+# which turns every incremental build into a full rebuild. Fail loudly
+# instead; callables should be configured as dotted import path strings.
+import pickle
+
+for _name, _value in list(globals().items()):
+    if _name.startswith(("myst_", "nb_", "napoleon_", "intersphinx_", "autodoc_")):
+        pickle.dumps(_value)
+del _name, _value
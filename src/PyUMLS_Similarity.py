@@ -1,5 +1,7 @@
+import contextlib
 import subprocess
 import os
+import queue
 import tempfile
 import pandas as pd
 import re
@@ -7,14 +9,371 @@ import threading
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from tqdm import tqdm
 
+# Patterns that do not depend on the input pairs are compiled once at import
+_CUI_RE = re.compile(r'C\d{7}')
+# One findShortestPath.pl record: a header line per path followed by its "=>" line,
+# or a message when the two inputs are not connected
+_PATH_HIT_RE = re.compile(r'The shortest path \(length: (\d+)\) between (.+?) \((C\d{7})\) and (.+) \((C\d{7})\):$')
+_PATH_MISS_RE = re.compile(r'There is not a path between (.+)$')
+# One findLeastCommonSubsumer.pl --depth result line
+_LCS_RE = re.compile(r'The least common subsumer between (.+?) \((C\d{7})\) and (.+?) \((C\d{7})\) '
+                     r'is (.+?) \((C\d{7})\) with a min and max depth of (\d+) and (\d+)')
+_LCS_MISS_RE = re.compile(r'There is not a least common subsumer between (.+) given the current view')
+
+# Columns of the shortest path and LCS DataFrames
+_PATH_COLUMNS = ['Term 1', 'Term 2', 'CUI 1', 'CUI 2', 'Path Length', 'Path']
+_LCS_COLUMNS = ['Term 1', 'Term 2', 'CUI 1', 'CUI 2', 'LCS', 'Min Depth', 'Max Depth']
+
+# Read buffer for Perl stdout; batch runs can print megabytes of results
+_PIPE_BUFSIZE = 1024 * 1024
+
+# Cached in place of a row for a pair that Perl reported as having no result
+_NO_ROW = object()
+
+# Connection options every Perl script takes, in the order they are passed
+_MYSQL_KEYS = ("database", "username", "password", "hostname", "socket")
+
+# Driver written to a private temporary directory so that several measures can be scored
+# with a single Perl start-up (UMLS::Interface load + MySQL connection). Run
+# without --infile it doubles as the persistent worker used when
+# PyUMLS_Similarity is created with persistent=True.
+_BATCH_SCRIPT_NAME = "umls-similarity-batch.pl"
+_BATCH_SCRIPT = r'''#!/usr/bin/perl
+#  umls-similarity-batch.pl - written out by PyUMLS_Similarity.
+#
+#  Loads UMLS::Interface once and scores every pair in --infile with each
+#  of the comma separated --measures, printing measure<>score<>cui1<>cui2
+#  lines in the same format as umls-similarity.pl, followed by <>input1<>input2
+#  so that every line can be matched to the pair it answers. A pair that
+#  cannot be scored gets a -1 score instead of no line.
+#
+#  Without --infile it runs as a persistent worker reading one command per
+#  line from STDIN:
+#      SIM<>measure<>precision<>input1<>input2
+#      PATH<>input1<>input2
+#      LCS<>input1<>input2
+#      END
+#  PATH and LCS print the same text as findShortestPath.pl --length and
+#  findLeastCommonSubsumer.pl --depth; END prints __END__ and flushes.
+use strict;
+use warnings;
+use Getopt::Long;
+use IO::Handle;
+use UMLS::Interface;
+
+my %opt = ();
+GetOptions(\%opt, "username=s", "password=s", "hostname=s", "database=s",
+           "socket=s", "measures=s", "infile=s", "precision=s", "forcerun")
+    or die "Please check the above mentioned option(s).\n";
+
+my $precision = defined $opt{"precision"} ? $opt{"precision"} : 4;
+
+my %option_hash = ();
+if(defined $opt{"forcerun"}) {
+    $option_hash{"forcerun"} = 1;
+}
+if(defined $opt{"username"} and defined $opt{"password"}) {
+    $option_hash{"driver"}   = "mysql";
+    $option_hash{"database"} = defined $opt{"database"} ? $opt{"database"} : "umls";
+    $option_hash{"username"} = $opt{"username"};
+    $option_hash{"password"} = $opt{"password"};
+    $option_hash{"hostname"} = defined $opt{"hostname"} ? $opt{"hostname"} : "localhost";
+    #  findShortestPath.pl and findLeastCommonSubsumer.pl pass --socket through
+    $option_hash{"socket"}   = defined $opt{"socket"} ? $opt{"socket"} : "";
+}
+
+my $umls = UMLS::Interface->new(\%option_hash);
+die "Unable to create UMLS::Interface object.\n" if(!$umls);
+
+#  one measure object per measure, all sharing $umls; they are loaded on first
+#  use so that a measure that cannot be loaded only fails its own scores
+my %meas = ();
+my %meas_errors = ();
+my @measures = defined $opt{"measures"} ? split(/,/, $opt{"measures"}) : ();
+
+my %similarityHash = ();
+
+if(defined $opt{"infile"}) {
+    my @input_array = ();
+    open(FILE, $opt{"infile"}) || die "Could not open file: $opt{infile}\n";
+    while(<FILE>) {
+        chomp;
+        s/\r$//;
+        if($_=~/^\s*$/) { next; }
+        push @input_array, $_;
+    }
+    close FILE;
+
+    foreach my $measure (@measures) {
+        foreach my $element (@input_array) {
+            &printScore($measure, $precision, $element);
+        }
+    }
+}
+else {
+    while(my $line = <STDIN>) {
+        chomp $line;
+        $line=~s/\r$//;
+        if($line eq "END") {
+            print "__END__\n";
+            STDOUT->flush();
+            next;
+        }
+        my ($op, @args) = split/<>/, $line;
+        #  keep the worker alive if a single request fails
+        eval {
+            if($op eq "SIM") {
+                my $measure = shift @args;
+                my $digits  = shift @args;
+                &printScore($measure, $digits, join '<>', @args);
+            }
+            elsif($op eq "PATH") { &printShortestPath(@args); }
+            elsif($op eq "LCS")  { &printLeastCommonSubsumer(@args); }
+            else { die "Unknown command: $op\n"; }
+            1;
+        } or print STDERR $@;
+    }
+}
+
+sub loadMeasure {
+    my $measure = shift;
+    if(exists $meas{$measure}) { return $meas{$measure}; }
+    #  a measure that failed to load is not retried for every pair
+    if(exists $meas_errors{$measure}) { die $meas_errors{$measure}; }
+    my $object = eval {
+        die "Unknown measure: $measure\n" if($measure!~/^\w+$/);
+        my $module = "UMLS::Similarity::$measure";
+        eval "require $module; 1" or die "Unable to load $module: $@";
+        my $created = $module->new($umls, {});
+        die "Unable to create measure object for $measure.\n" if(!$created);
+        $created;
+    };
+    if(!$object) {
+        $meas_errors{$measure} = $@;
+        die $@;
+    }
+    $meas{$measure} = $object;
+    return $object;
+}
+
+#  escape the ' character on input if it exists
+sub escapeInput {
+    my $element = shift;
+    if(! ($element=~/\\\'/)) { $element=~s/'/\\'/g; }
+    return $element;
+}
+
+#  prints the score line for a single pair, or a -1 score if it cannot be scored
+sub printScore {
+    my ($measure, $digits, $element) = @_;
+
+    my ($input1, $input2) = split/<>/, $element;
+    $input1 = "" if(!defined $input1); $input2 = "" if(!defined $input2);
+    $input1=~s/^\s+//g; $input1=~s/\s+$//g;
+    $input2=~s/^\s+//g; $input2=~s/\s+$//g;
+
+    my $result = eval {
+        &loadMeasure($measure);
+        &scorePair($measure, $digits, &escapeInput($element));
+    };
+    if(!defined $result) {
+        print STDERR $@;
+        my $floatformat = join '', '%', '.', $digits, 'f';
+        $result = (sprintf $floatformat, -1) . "<>$input1<>$input2";
+    }
+    print "$measure<>$result<>$input1<>$input2\n";
+}
+
+#  mirrors calculateSimilarity in umls-similarity.pl for a single pair
+sub scorePair {
+    my ($measure, $digits, $element) = @_;
+    my $floatformat = join '', '%', '.', $digits, 'f';
+    my $noscore     = sprintf $floatformat, -1;
+
+    my ($input1, $input2) = split/<>/, $element;
+    $input1=~s/^\s+//g; $input1=~s/\s+$//g;
+    $input2=~s/^\s+//g; $input2=~s/\s+$//g;
+
+    my $c1 = undef; my $c2 = undef;
+    my $cui_flag1 = 0; my $cui_flag2 = 0;
+
+    if($input1=~/^C[0-9]{7}$/) { push @{$c1}, $input1; $cui_flag1 = 1; }
+    elsif($measure=~/(lesk|vector)/) { $c1 = $umls->getDefConceptList($input1); }
+    else { $c1 = $umls->getConceptList($input1); }
+
+    if($input2=~/^C[0-9]{7}$/) { push @{$c2}, $input2; $cui_flag2 = 1; }
+    elsif($measure=~/(lesk|vector)/) { $c2 = $umls->getDefConceptList($input2); }
+    else { $c2 = $umls->getConceptList($input2); }
+
+    my $t1 = $input1; my $t2 = $input2;
+    if($cui_flag1) { $t1 = $umls->getAllPreferredTerm($input1); }
+    if($cui_flag2) { $t2 = $umls->getAllPreferredTerm($input2); }
+
+    my $cache = \%{$similarityHash{$measure}};
+    foreach my $cc1 (@{$c1}) {
+        foreach my $cc2 (@{$c2}) {
+            if(exists $cache->{$cc1}{$cc2}) { next; }
+            if(exists $cache->{$cc2}{$cc1}) {
+                $cache->{$cc1}{$cc2} = $cache->{$cc2}{$cc1};
+                next;
+            }
+            $cache->{$cc1}{$cc2} = $meas{$measure}->getRelatedness($cc1, $cc2);
+        }
+    }
+
+    #  nam is a distance, so the best pairing is the minimum
+    my $cc1 = ""; my $cc2 = ""; my $score = "";
+    my $max_score = -1; my $min_score = 999;
+    foreach my $concept1 (@{$c1}) {
+        foreach my $concept2 (@{$c2}) {
+            my $value = $cache->{$concept1}{$concept2};
+            if($measure eq "nam") {
+                if($min_score > $value) {
+                    $min_score = $value; $score = $value;
+                    $cc1 = $concept1; $cc2 = $concept2;
+                }
+            }
+            elsif($max_score <= $value) {
+                $max_score = $value; $score = $value;
+                $cc1 = $concept1; $cc2 = $concept2;
+            }
+        }
+    }
+
+    if($cc1 eq "" and $cc2 eq "") { return "$noscore<>$input1<>$input2"; }
+    $score = sprintf $floatformat, $score;
+    if($cui_flag1 and $cui_flag2) { return "$score<>$cc1($t1)<>$cc2($t2)"; }
+    if($cui_flag1)                { return "$score<>$t1($cc1)<>$input2($cc2)"; }
+    if($cui_flag2)                { return "$score<>$input1($cc1)<>$t2($cc2)"; }
+    return "$score<>$input1($cc1)<>$input2($cc2)";
+}
+
+#  mirrors findShortestPath.pl --length for a single pair
+sub printShortestPath {
+    my ($input1, $input2) = @_;
+
+    my $c1 = undef; my $c2 = undef;
+    my $flag1 = "cui"; my $flag2 = "cui";
+    if($input1=~/C[0-9]+/) { push @{$c1}, $input1; }
+    else { $c1 = $umls->getConceptList($input1); $flag1 = "term"; }
+    if($input2=~/C[0-9]+/) { push @{$c2}, $input2; }
+    else { $c2 = $umls->getConceptList($input2); $flag2 = "term"; }
+
+    my $printFlag = 0;
+    foreach my $cui1 (@{$c1}) {
+        foreach my $cui2 (@{$c2}) {
+            my $t1 = $input1; my $t2 = $input2;
+            if($flag1 eq "cui") { my $ts1 = $umls->getTermList($cui1); $t1 = shift @{$ts1}; }
+            if($flag2 eq "cui") { my $ts2 = $umls->getTermList($cui2); $t2 = shift @{$ts2}; }
+
+            my $shortestpaths = [];
+            if($cui1 eq $cui2) { push @{$shortestpaths}, "$cui1 $cui2"; }
+            else { $shortestpaths = $umls->findShortestPath($cui1, $cui2); }
+
+            foreach my $path (@{$shortestpaths}) {
+                my @shortestpath = split/\s+/, $path;
+                my $length = $#shortestpath + 1;
+                print "\nThe shortest path (length: $length) between $t1 ($cui1) and $t2 ($cui2):\n";
+                print "  => ";
+                foreach my $concept (@shortestpath) {
+                    my $t = $umls->getAllPreferredTerm($concept);
+                    print "$concept ($t) ";
+                }
+                print "\n";
+                $printFlag = 1;
+            }
+        }
+    }
+    if(!$printFlag) {
+        print "\nThere is not a path between $input1 and $input2\n";
+        print "given the current view of the UMLS.\n\n";
+    }
+}
+
+#  mirrors findLeastCommonSubsumer.pl --depth for a single pair
+sub printLeastCommonSubsumer {
+    my ($input1, $input2) = @_;
+
+    my $c1 = undef; my $c2 = undef;
+    if($input1=~/C[0-9]+/) { push @{$c1}, $input1; }
+    else { $c1 = $umls->getConceptList($input1); }
+    if($input2=~/C[0-9]+/) { push @{$c2}, $input2; }
+    else { $c2 = $umls->getConceptList($input2); }
+
+    my $printFlag = 0;
+    foreach my $cui1 (@{$c1}) {
+        foreach my $cui2 (@{$c2}) {
+            my $t1 = $input1; my $t2 = $input2;
+            if($t1=~/C[0-9]+/) { ($t1) = $umls->getAllPreferredTerm($cui1); }
+            if($t2=~/C[0-9]+/) { ($t2) = $umls->getAllPreferredTerm($cui2); }
+
+            if(($umls->exists($cui1) == 0) or ($umls->exists($cui2) == 0)) { next; }
+
+            my $lcses = [];
+            if($cui1 eq $cui2) { push @{$lcses}, $cui1; }
+            else { $lcses = $umls->findLeastCommonSubsumer($cui1, $cui2); }
+
+            foreach my $lcs (@{$lcses}) {
+                my ($t) = ($cui1 eq $cui2) ? ($t1) : $umls->getAllPreferredTerm($lcs);
+                my $min = $umls->findMinimumDepth($lcs);
+                my $max = $umls->findMaximumDepth($lcs);
+                print "\nThe least common subsumer between $t1 ($cui1) and $t2 ($cui2) is $t ($lcs) ";
+                print "with a min and max depth of $min and $max \n";
+                $printFlag = 1;
+            }
+        }
+    }
+    if(!$printFlag) {
+        print "\nThere is not a least common subsumer between $input1 and $input2 given the current view of the UMLS.\n\n";
+    }
+}
+'''
+
 class PyUMLS_Similarity:
-    def __init__(self, mysql_info, work_directory=""):
+    # Task name -> (method name, whether 'arguments' is unpacked). The path and LCS 
+    # tasks take their 'arguments' as the list of pairs itself.
+    _TASK_FUNCTIONS = {
+        'similarity': ('similarity', True),
+        'shortest_path': ('find_shortest_path', False),
+        'lcs': ('find_least_common_subsumer', False),
+    }
+
+    def __init__(self, mysql_info, work_directory="", persistent=False):
         self.perl_bin_path = r"C:\Strawberry\perl\bin\perl.exe"
+        # The UMLS::Similarity scripts are run from the directory they are installed in
+        self._perl_script_dir = r"C:\Strawberry\perl\site\bin"
+        self._similarity_script = os.path.join(self._perl_script_dir, "umls-similarity.pl")
+        self._shortest_path_script = os.path.join(self._perl_script_dir, "findShortestPath.pl")
+        self._lcs_script = os.path.join(self._perl_script_dir, "findLeastCommonSubsumer.pl")
+        missing_keys = [key for key in _MYSQL_KEYS if key not in mysql_info]
+        if missing_keys:
+            raise ValueError(f"mysql_info is missing required keys: {', '.join(missing_keys)}")
         self.mysql_info = mysql_info
+        # The connection options are the same for every Perl call, so build them once
+        self._mysql_argv = tuple(f"--{key}={mysql_info[key]}" for key in _MYSQL_KEYS)
+        self.work_directory = work_directory or tempfile.gettempdir()
+        # Private directory the Perl driver is written to, created on first use
+        self._script_dir = None
+        self._script_lock = threading.Lock()
+        # With persistent=True every call is served by a long-lived Perl process; an
+        # integer keeps that many of them so that concurrent calls do not queue up
+        self.persistent = persistent
+        self._worker_count = int(persistent) if persistent else 0
+        self._worker_pool = queue.Queue()
+        for _ in range(self._worker_count):
+            self._worker_pool.put(None)  # Started on first use
+        # Results already computed, keyed by ('SIM', measure, precision, cui1, cui2), 
+        # ('PATH', cui1, cui2) or ('LCS', cui1, cui2). While a key is being computed 
+        # its entry is a threading.Event that is set once it is done.
+        self._result_cache = {}
+        self._cache_lock = threading.Lock()
 
     def similarity(self, cui_pairs, measures=['lch'], precision=4, forcerun=True):
         """
-        Calculate similarity for each measure in a concurrent manner.
+        Calculate similarity for every measure with a single Perl run.
+
+        Scores this instance has already computed for a (measure, precision, pair) 
+        are reused, so only new pairs and measures are sent to Perl.
 
         Args:
             cui_pairs (list of tuple): A list of tuples, where each tuple contains two CUIs for comparison.
@@ -25,38 +384,66 @@ class PyUMLS_Similarity:
         Returns:
             pandas.DataFrame: A DataFrame containing the similarity results for each measure.
         """
-        in_file_path = tempfile.gettempdir() + r"\umls-similarity-temp.txt"
+        # Repeated measures would otherwise be scored twice and produce duplicate columns
+        measures = list(dict.fromkeys(measures))
+
+        def compute(keys):
+            if self.persistent:
+                # The worker takes the pairs on stdin, so no pairs file is needed
+                return self._command_results(keys)
+            # Only the pairs and measures missing from the cache are sent to Perl
+            pairs = list(dict.fromkeys(key[3:] for key in keys))
+            missing_measures = list(dict.fromkeys(key[1] for key in keys))
+            with self._pairs_file(pairs) as in_file_path:
+                lines = self._similarity_driver_lines(in_file_path, missing_measures, precision, forcerun)
+                return self._similarity_results(lines, missing_measures, precision, pairs)
+
+        # Each distinct pair is scored once and its results are copied to every occurrence
+        keys = [('SIM', measure, precision) + pair for measure in measures for pair in self._unique_pairs(cui_pairs)]
+        return self._similarity_frame(self._cached_results(keys, compute), cui_pairs, measures, precision)
+
+    def _similarity_frame(self, results, cui_pairs, measures, precision):
+        """
+        Builds the similarity DataFrame for the given pairs from cached results.
 
-        def calculate_measure_similarity(measure):
-            """
-            Helper function to calculate similarity for a single measure.
+        Args:
+            results (dict): Results keyed by ('SIM', measure, precision, cui1, cui2), as returned by `_cached_results`.
+            cui_pairs (list of tuple): A list of tuples, where each tuple contains two CUIs.
+            measures (list of str): The distinct measures, in column order.
+            precision (int): The precision the scores were computed with.
 
-            Args:
-                measure (str): The semantic similarity measure to be used.
+        Returns:
+            pandas.DataFrame: A DataFrame containing the similarity results for each measure.
+        """
+        unique_pairs = self._unique_pairs(cui_pairs)
+
+        # A pair without a result keeps its place with an 'N/A' score
+        all_results = []
+        for measure in measures:
+            all_results.append((measure, [results.get(('SIM', measure, precision) + pair, [measure, pair[0], pair[1], 'N/A'])
+                                          for pair in unique_pairs]))
+        all_results = self._expand_similarity_results(all_results, unique_pairs, cui_pairs)
+        return self.combine_similarity_results(all_results, cui_pairs)
 
-            Returns:
-                list: The results of the similarity calculation for the given measure.
-            """
-            with open(in_file_path, 'w', encoding='utf-8') as f_out:
-                for cui1, cui2 in cui_pairs:
-                    f_out.write(f"{cui1}<>{cui2}\n")
-            return self.similarity_from_file(in_file_path, measure, precision, forcerun)
+    def _expand_similarity_results(self, all_results, unique_pairs, cui_pairs):
+        """
+        Copies the results scored for each distinct pair back to every occurrence of that pair.
 
-        # Start threads for each measure calculation
-        with ThreadPoolExecutor() as executor:
-            futures = {executor.submit(calculate_measure_similarity, measure): measure for measure in measures}
-            all_results = []
+        Args:
+            all_results (list of tuples): (measure, results) tuples scored on unique_pairs.
+            unique_pairs (list of tuple): The distinct pairs, as returned by `_unique_pairs`.
+            cui_pairs (list of tuple): The pairs originally requested, possibly with repeats.
 
-            for future in as_completed(futures):
-                measure = futures[future]
-                try:
-                    measure_result = future.result()
-                    all_results.append((measure, measure_result))
-                except Exception as e:
-                    print(f"Error calculating similarity for measure '{measure}': {e}")
+        Returns:
+            list of tuples: (measure, results) tuples with one result per entry in cui_pairs.
+        """
+        if len(unique_pairs) == len(cui_pairs):
+            return all_results
 
-        # Combine results from all threads
-        return self.combine_similarity_results(all_results, cui_pairs)
+        position = {pair: i for i, pair in enumerate(unique_pairs)}
+        indices = [position[tuple(pair)] for pair in cui_pairs]
+        return [(measure, [results[i] for i in indices if i < len(results)])
+                for measure, results in all_results]
 
     def combine_similarity_results(self, all_results, cui_pairs):
         """
@@ -77,26 +464,24 @@ class PyUMLS_Similarity:
                               The DataFrame contains columns for Term 1, Term 2, 
                               CUI 1, CUI 2, and a column for each similarity measure.
         """
-        # Preparing data for DataFrame
-        data = []
-        for i, pair in enumerate(cui_pairs):
-            if all_results:
-                first_measure_results = all_results[0][1]
-                term1, cui1 = self.extract_term_and_cui(first_measure_results[i][1]) if i < len(first_measure_results) else ('N/A', 'N/A')
-                term2, cui2 = self.extract_term_and_cui(first_measure_results[i][2]) if i < len(first_measure_results) else ('N/A', 'N/A')
-            else:
-                term1, term2, cui1, cui2 = 'N/A', 'N/A', 'N/A', 'N/A'
-
-            row = [term1, term2, cui1, cui2]
-            for measure, results in all_results:
-                score = results[i][3] if i < len(results) else 'N/A'
-                row.append(score)
-            data.append(row)
-
-        # Creating the DataFrame
-        columns = ['Term 1', 'Term 2', 'CUI 1', 'CUI 2'] + [measure for measure, _ in all_results]
-        df = pd.DataFrame(data, columns=columns)
-        return df
+        # Every measure was run on the same pairs in the same order, so the terms and 
+        # CUIs only need to be read once from the first measure's results
+        n_pairs = len(cui_pairs)
+        terms1, terms2 = ['N/A'] * n_pairs, ['N/A'] * n_pairs
+        cuis1, cuis2 = ['N/A'] * n_pairs, ['N/A'] * n_pairs
+        if all_results:
+            for i, result in enumerate(all_results[0][1][:n_pairs]):
+                terms1[i], cuis1[i] = self.extract_term_and_cui(result[1])
+                terms2[i], cuis2[i] = self.extract_term_and_cui(result[2])
+
+        # One list per column, handed to pandas in a single dict
+        columns = {'Term 1': terms1, 'Term 2': terms2, 'CUI 1': cuis1, 'CUI 2': cuis2}
+        for measure, results in all_results:
+            scores = [result[3] for result in results[:n_pairs]]
+            scores += ['N/A'] * (n_pairs - len(scores))
+            columns[measure] = scores
+
+        return pd.DataFrame(columns)
 
     def extract_term_and_cui(self, term):
         """
@@ -139,13 +524,10 @@ class PyUMLS_Similarity:
             list: A list of similarity results, each result is a list containing the measure, 
                 the two CUIs, and the calculated similarity score.
         """
+        if self.persistent:
+            return self.similarity_from_file_multi(in_file, [similarity_measure], precision, forcerun, verbose)[0][1]
 
         umls_sim_params = {}
-        umls_sim_params["--database"]  = self.mysql_info["database"]
-        umls_sim_params["--username"]  = self.mysql_info["username"]
-        umls_sim_params["--password"]  = self.mysql_info["password"]
-        umls_sim_params["--hostname"]  = self.mysql_info["hostname"]
-        umls_sim_params["--socket"]    = self.mysql_info["socket"]
         umls_sim_params["--measure"]   = similarity_measure
         umls_sim_params["--precision"] = str(precision)
 
@@ -154,45 +536,587 @@ class PyUMLS_Similarity:
  
         umls_sim_params["--infile"] = in_file
 
-        cwd = r'C:\Strawberry\perl\site\bin'
-        umls_similarity_script_path =cwd+ r"\umls-similarity.pl"
+        cwd = self._perl_script_dir
+        umls_similarity_script_path = self._similarity_script
         # new_env["WNHome"] = r'C:\Program Files (x86)\WordNet\2.1'
 
-        process_args = [self.perl_bin_path, umls_similarity_script_path]
-        for key, value in umls_sim_params.items():
-            if value:  # Checks if value is not empty
-                process_args.append(key + "=" + value)
-            else:
-                process_args.append(key)
-        kv_str = " ".join(process_args)
-        print(kv_str)
+        # Flags with an empty value are passed bare, e.g. --forcerun
+        process_args = [self.perl_bin_path, umls_similarity_script_path, *self._mysql_argv]
+        process_args += [f"{key}={value}" if value else key for key, value in umls_sim_params.items()]
+        if verbose:
+            print(" ".join(process_args))
 
-        process = subprocess.Popen(process_args, cwd=cwd, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        # stderr is only captured when it is going to be printed
+        process = self._popen(process_args, cwd, verbose)
 
-        # After the subprocess ends, check if there are any errors
-        stderr_output = process.stderr.read()
-        if stderr_output and verbose:
-            print("Error:\n", stderr_output.strip())
-
-        stdout_output, _ = process.communicate()
-        #print(stdout_output)
-        decoded_stdout = stdout_output.decode('utf-8', 'ignore')
-        output_lines = decoded_stdout.strip().split('\r\n')
-        
+        # Parse each line as Perl writes it instead of buffering the whole output
         similarity_results = []
-        for line in output_lines:
+        for line in self._stream_stdout_lines(process, verbose):
             parts = line.strip().split('<>')
             if len(parts) >= 3:
                 similarity_results.append([similarity_measure, parts[1], parts[2], parts[0]])
 
         return similarity_results
 
+    def similarity_from_file_multi(self, in_file, measures=['lch'], precision=4, forcerun=True, verbose=False):
+        """
+        Calculates semantic similarity for several measures from a file containing CUI pairs.
+
+        Unlike `similarity_from_file`, which starts one Perl process per measure, this 
+        method runs a batch driver that loads the UMLS interface once and scores every 
+        pair with every measure.
+
+        Args:
+            in_file (str): Path to the file containing CUI pairs.
+            measures (list of str): The semantic similarity measures to use (default ['lch']).
+            precision (int): The precision of the similarity scores (default 4).
+            forcerun (bool): If True, forces the execution of the similarity calculation.
+            verbose (bool): If True, prints additional information for debugging.
+
+        Returns:
+            list of tuple: One (measure, results) tuple per measure, in the order given, where 
+                results has the same layout as the list returned by `similarity_from_file`.
+        """
+        if self.persistent:
+            return self._worker_similarity(self._read_pairs_file(in_file), measures, precision)
+
+        lines = self._similarity_driver_lines(in_file, measures, precision, forcerun, verbose)
+        return self._parse_multi_similarity_output(lines, measures, self._read_pairs_file(in_file))
+
+    def _similarity_driver_lines(self, in_file, measures, precision=4, forcerun=True, verbose=False):
+        """
+        Runs the batch driver on a file containing CUI pairs and yields its output lines.
+
+        Args:
+            in_file (str): Path to the file containing CUI pairs.
+            measures (list of str): The semantic similarity measures to use.
+            precision (int): The precision of the similarity scores (default 4).
+            forcerun (bool): If True, forces the execution of the similarity calculation.
+            verbose (bool): If True, prints additional information for debugging.
+
+        Yields:
+            str: One measure<>score<>cui1<>cui2<>input1<>input2 line, as it is written.
+        """
+        umls_sim_params = {}
+        umls_sim_params["--measures"]  = ",".join(measures)
+        umls_sim_params["--precision"] = str(precision)
+
+        if forcerun:
+            umls_sim_params["--forcerun"] = ""
+
+        umls_sim_params["--infile"] = in_file
+
+        cwd = self._perl_script_dir
+        # Flags with an empty value are passed bare, e.g. --forcerun
+        process_args = [self.perl_bin_path, self._write_batch_script(), *self._mysql_argv]
+        process_args += [f"{key}={value}" if value else key for key, value in umls_sim_params.items()]
+        if verbose:
+            print(" ".join(process_args))
+
+        # stderr is only captured when it is going to be printed
+        process = self._popen(process_args, cwd, verbose)
+        return self._stream_stdout_lines(process, verbose)
+
+    def _stream_stdout_lines(self, process, verbose=False, stdin_data=None):
+        """
+        Yields the decoded stdout lines of a Perl process as they are written.
+
+        stderr is drained on a background thread, and stdin_data is written from one, so 
+        a full pipe cannot stall the Perl process while stdout is being read. A process 
+        that exits with a non-zero status, e.g. because it could not connect to the UMLS 
+        database, raises a RuntimeError once its output has been read.
+
+        Args:
+            process (subprocess.Popen): A process started with stdout and stderr pipes.
+            verbose (bool): If True, prints anything the process wrote to stderr.
+            stdin_data (bytes): Input for the process; stdin is closed right away if None.
+
+        Yields:
+            str: One line of stdout without its line ending.
+        """
+        stderr_chunks = []
+        stderr_reader = None
+        if process.stderr:
+            stderr_reader = threading.Thread(target=lambda: stderr_chunks.append(process.stderr.read()), daemon=True)
+            stderr_reader.start()
+        writer = None
+        if process.stdin and stdin_data:
+            writer = threading.Thread(target=self._feed_stdin, args=(process, stdin_data, True), daemon=True)
+            writer.start()
+        elif process.stdin:
+            process.stdin.close()
+
+        for raw in process.stdout:
+            yield raw.decode('utf-8', 'ignore').rstrip('\r\n')
+
+        process.stdout.close()
+        returncode = process.wait()
+        if writer:
+            writer.join()
+        if stderr_reader:
+            stderr_reader.join()
+        stderr_output = b"".join(stderr_chunks)
+        if stderr_output and verbose:
+            print("Error:\n", stderr_output.strip())
+        if returncode:
+            raise RuntimeError(f"The Perl process exited with status {returncode}")
+
+    def _feed_stdin(self, process, data, close=False):
+        """
+        Writes data to the stdin of a Perl process, ignoring a process that has already exited.
+
+        Args:
+            process (subprocess.Popen): A process started with a stdin pipe.
+            data (bytes): The input to write.
+            close (bool): If True, stdin is closed afterwards.
+        """
+        try:
+            process.stdin.write(data)
+            process.stdin.flush()
+            if close:
+                process.stdin.close()
+        except OSError:
+            pass  # The process died; whoever reads its stdout reports it
+
+    def _similarity_rows(self, lines, measures):
+        """
+        Indexes measure<>score<>cui1<>cui2<>input1<>input2 lines from the Perl driver by the pair they answer.
+
+        Args:
+            lines (iterable of str): The stdout lines of the Perl driver.
+            measures (list of str): The measures that were requested.
+
+        Returns:
+            dict: [measure, cui1, cui2, score] rows keyed by (measure, input1, input2), 
+                for every line the driver printed.
+        """
+        rows = {}
+        measures = set(measures)
+        for line in lines:
+            parts = line.strip().split('<>')
+            if len(parts) >= 6 and parts[0] in measures:
+                rows.setdefault((parts[0], parts[4], parts[5]), [parts[0], parts[2], parts[3], parts[1]])
+        return rows
+
+    def _similarity_results(self, lines, measures, precision, cui_pairs):
+        """
+        Matches the Perl driver's output to similarity cache keys.
+
+        Args:
+            lines (iterable of str): The stdout lines of the Perl driver.
+            measures (list of str): The measures that were requested.
+            precision (int): The precision the scores were requested with.
+            cui_pairs (list of tuple): The pairs that were submitted.
+
+        Returns:
+            dict: The result row for every ('SIM', measure, precision, cui1, cui2) key the driver printed a line for.
+        """
+        rows = self._similarity_rows(lines, measures)
+        results = {}
+        for pair in cui_pairs:
+            # The driver echoes each input with surrounding whitespace removed
+            echoed = tuple(str(cui).strip() for cui in pair)
+            for measure in measures:
+                row = rows.get((measure,) + echoed)
+                if row is not None:
+                    results[('SIM', measure, precision) + tuple(pair)] = row
+        return results
+
+    def _parse_multi_similarity_output(self, lines, measures, pair_lines):
+        """
+        Splits measure<>score<>cui1<>cui2<>input1<>input2 lines from the Perl driver into per-measure results.
+
+        Every line is matched to the pair it answers rather than by position, so a pair 
+        the driver printed nothing for gets an 'N/A' score instead of shifting the results 
+        of the pairs after it.
+
+        Args:
+            lines (iterable of str): The stdout lines of the Perl driver.
+            measures (list of str): The measures that were requested.
+            pair_lines (list of str): The cui1<>cui2 lines that were submitted.
+
+        Returns:
+            list of tuple: One (measure, results) tuple per measure, in the order given, 
+                with one result per entry in pair_lines.
+        """
+        rows = self._similarity_rows(lines, measures)
+
+        # The driver echoes each input with surrounding whitespace removed
+        keys = [tuple(part.strip() for part in (line.split('<>') + [''])[:2]) for line in pair_lines]
+        return [(measure, [rows.get((measure,) + key, [measure, key[0], key[1], 'N/A']) for key in keys])
+                for measure in measures]
+
+    def _write_batch_script(self):
+        """
+        Writes the multi-measure Perl driver on first use and returns its path.
+
+        The driver goes into a directory created with mkdtemp inside the work directory, 
+        so other users cannot plant or swap the script that is run. The directory is 
+        removed by `close()`, or when the instance is garbage collected.
+
+        Returns:
+            str: Path to the driver script.
+        """
+        with self._script_lock:
+            if self._script_dir is None:
+                script_dir = tempfile.TemporaryDirectory(prefix="umls-similarity-", dir=self.work_directory,
+                                                         ignore_cleanup_errors=True)
+                with open(os.path.join(script_dir.name, _BATCH_SCRIPT_NAME), 'w', encoding='utf-8') as f_out:
+                    f_out.write(_BATCH_SCRIPT)
+                self._script_dir = script_dir
+            return os.path.join(self._script_dir.name, _BATCH_SCRIPT_NAME)
+
+    def _unique_pairs(self, cui_pairs):
+        """
+        Drops repeated CUI pairs, keeping the first occurrence of each.
+
+        Args:
+            cui_pairs (list of tuple): A list of tuples, where each tuple contains two CUIs.
+
+        Returns:
+            list of tuple: The distinct pairs, in their original order.
+        """
+        return list(dict.fromkeys(tuple(pair) for pair in cui_pairs))
+
+    def _cached_results(self, keys, compute):
+        """
+        Looks up results in the instance cache, computing all the missing ones with a single call.
+
+        A key that another thread is already computing is waited for rather than computed 
+        twice. Only the results `compute` returns are cached: nothing is kept when it 
+        raises, and a key it has no result for is computed again by the next call.
+
+        Args:
+            keys (iterable of tuple): Cache keys, such as ('PATH', cui1, cui2).
+            compute (callable): Takes a list of missing keys and returns a dict with the 
+                                results it found for them.
+
+        Returns:
+            dict: The result for every key that has one.
+        """
+        results = {}
+        pending = list(dict.fromkeys(keys))
+        while pending:
+            # Claim the keys nobody has computed yet and note the ones still in flight
+            with self._cache_lock:
+                missing, waiting, in_flight = [], [], set()
+                for key in pending:
+                    value = self._result_cache.get(key)
+                    if value is None:
+                        missing.append(key)
+                    elif isinstance(value, threading.Event):
+                        waiting.append(key)
+                        in_flight.add(value)
+                    else:
+                        results[key] = value
+                claimed = threading.Event()
+                for key in missing:
+                    self._result_cache[key] = claimed
+
+            if missing:
+                try:
+                    computed = compute(missing)
+                except BaseException:
+                    with self._cache_lock:
+                        for key in missing:
+                            del self._result_cache[key]
+                    raise
+                else:
+                    with self._cache_lock:
+                        for key in missing:
+                            if key in computed:
+                                self._result_cache[key] = results[key] = computed[key]
+                            else:
+                                del self._result_cache[key]
+                finally:
+                    claimed.set()
+
+            # A key whose computation failed in another thread is claimed again on the next pass
+            for event in in_flight:
+                event.wait()
+            pending = waiting
+
+        return results
+
+    @contextlib.contextmanager
+    def _pairs_file(self, cui_pairs):
+        """
+        Writes CUI pairs to a uniquely named temporary file that is removed again on exit.
+
+        Each call gets its own file, so concurrent calls never overwrite each other's input, 
+        and nothing is left behind once the Perl run that reads it has finished.
+
+        Args:
+            cui_pairs (list of tuple): A list of tuples, where each tuple contains two CUIs.
+
+        Yields:
+            str: Path to the file containing the cui1<>cui2 lines.
+        """
+        fd, in_file_path = tempfile.mkstemp(prefix="umls-similarity-", suffix=".txt")
+        try:
+            with open(fd, 'w', encoding='utf-8') as f_out:
+                f_out.write("".join(line + "\n" for line in self._pair_lines(cui_pairs)))
+            yield in_file_path
+        finally:
+            try:
+                os.remove(in_file_path)
+            except OSError:
+                pass
+
+    def _pair_lines(self, cui_pairs):
+        """
+        Formats CUI pairs as the cui1<>cui2 lines read by the Perl scripts.
+
+        Args:
+            cui_pairs (list of tuple): A list of tuples, where each tuple contains two CUIs.
+
+        Returns:
+            list of str: One line per pair, without line endings.
+        """
+        return [f"{cui1}<>{cui2}" for cui1, cui2 in cui_pairs]
+
+    def _read_pairs_file(self, in_file):
+        """
+        Reads the non-empty cui1<>cui2 lines of a pairs file.
+
+        Args:
+            in_file (str): Path to the file containing CUI pairs.
+
+        Returns:
+            list of str: The pair lines, without line endings.
+        """
+        with open(in_file, 'r', encoding='utf-8') as f_in:
+            return [line.strip() for line in f_in if line.strip()]
+
+    def _worker_args(self):
+        """
+        Builds the command line that runs the Perl driver in worker mode.
+
+        Returns:
+            list of str: The Perl binary, the driver script and its options.
+        """
+        # The worker must never stop at an interactive prompt
+        return [self.perl_bin_path, self._write_batch_script(), *self._mysql_argv, "--forcerun"]
+
+    def _popen(self, process_args, cwd, verbose=False):
+        """
+        Starts a Perl process with piped stdin/stdout.
+
+        On Windows the process is started without a console window, which would 
+        otherwise be created (and shown) for every call.
+
+        Args:
+            process_args (list of str): The command line to run.
+            cwd (str): The working directory for the process.
+            verbose (bool): If True, stderr is piped so it can be printed; otherwise it is discarded.
+
+        Returns:
+            subprocess.Popen: The started process.
+        """
+        kwargs = {}
+        if os.name == 'nt':
+            startupinfo = subprocess.STARTUPINFO()
+            startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+            startupinfo.wShowWindow = subprocess.SW_HIDE
+            kwargs = {'creationflags': subprocess.CREATE_NO_WINDOW, 'startupinfo': startupinfo}
+
+        return subprocess.Popen(process_args, cwd=cwd, bufsize=_PIPE_BUFSIZE, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                stderr=subprocess.PIPE if verbose else subprocess.DEVNULL, **kwargs)
+
+    def _start_worker(self):
+        """
+        Starts a persistent Perl worker, which loads the UMLS interface once and then 
+        serves SIM/PATH/LCS requests from stdin for the lifetime of this object.
+
+        Returns:
+            subprocess.Popen: The worker process.
+        """
+        cwd = self._perl_script_dir
+        return self._popen(self._worker_args(), cwd)
+
+    def _worker_request(self, commands):
+        """
+        Sends a batch of commands to an idle persistent Perl worker and collects its reply.
+
+        Blocks until one of the workers is free.
+
+        Args:
+            commands (iterable of str): Worker commands such as 'PATH<>cui1<>cui2'.
+
+        Returns:
+            list of str: The lines the worker printed for the batch.
+        """
+        payload = ("".join(command + "\n" for command in commands) + "END\n").encode('utf-8')
+
+        worker = self._worker_pool.get()
+        try:
+            if worker is None or worker.poll() is not None:
+                worker = self._start_worker()
+            # Write from another thread so that a large reply filling the stdout pipe
+            # cannot block the worker while this thread is still writing its input
+            writer = threading.Thread(target=self._feed_stdin, args=(worker, payload), daemon=True)
+            writer.start()
+
+            lines = []
+            for raw in iter(worker.stdout.readline, b''):
+                line = raw.decode('utf-8', 'ignore').rstrip('\r\n')
+                if line == "__END__":
+                    writer.join()
+                    return lines
+                lines.append(line)
+
+            worker = None
+            raise RuntimeError("The persistent Perl worker exited unexpectedly")
+        finally:
+            self._worker_pool.put(worker)
+
+    def _worker_similarity(self, pair_lines, measures, precision):
+        """
+        Scores pairs with every measure on a persistent worker.
+
+        Args:
+            pair_lines (list of str): The cui1<>cui2 lines to score.
+            measures (list of str): The semantic similarity measures to use.
+            precision (int): The precision of the similarity scores.
+
+        Returns:
+            list of tuple: One (measure, results) tuple per measure, as returned by `similarity_from_file_multi`.
+        """
+        lines = self._worker_request(
+            f"SIM<>{measure}<>{precision}<>{pair}" for measure in measures for pair in pair_lines)
+        return self._parse_multi_similarity_output(lines, measures, pair_lines)
+
+    def _worker_shortest_path(self, pair_lines, cui_pairs):
+        """
+        Finds the shortest paths between pairs on a persistent worker.
+
+        Args:
+            pair_lines (list of str): The cui1<>cui2 lines to look up.
+            cui_pairs (list of tuple): The pairs to build result rows for.
+
+        Returns:
+            pandas.DataFrame: The shortest path results, as returned by `find_shortest_path_from_file`.
+        """
+        lines = self._worker_request("PATH<>" + pair for pair in pair_lines)
+        return self._parse_shortest_path_output(lines, cui_pairs)
+
+    def _worker_least_common_subsumer(self, pair_lines, cui_pairs):
+        """
+        Finds the least common subsumers of pairs on a persistent worker.
+
+        Args:
+            pair_lines (list of str): The cui1<>cui2 lines to look up.
+            cui_pairs (list of tuple): The pairs to build result rows for.
+
+        Returns:
+            pandas.DataFrame: The LCS results, as returned by `find_least_common_subsumer_from_file`.
+        """
+        lines = self._worker_request("LCS<>" + pair for pair in pair_lines)
+        return self._parse_least_common_subsumer_output(lines, cui_pairs)
+
+    def _run_command_batches(self, batches):
+        """
+        Runs several batches of worker commands with a single UMLS interface load.
+
+        With persistent=True the batches go to the persistent workers; otherwise one 
+        short-lived worker process is started for all of them and its output is read 
+        as it is written.
+
+        Args:
+            batches (list of list of str): Worker commands, one list per batch.
+
+        Returns:
+            list of list of str: The lines the worker printed for each batch, in the order given.
+        """
+        if self.persistent:
+            return [self._worker_request(commands) for commands in batches]
+
+        payload = "".join("".join(command + "\n" for command in commands) + "END\n" for commands in batches)
+        cwd = self._perl_script_dir
+        process = self._popen(self._worker_args(), cwd)
+
+        outputs = []
+        lines = []
+        for line in self._stream_stdout_lines(process, stdin_data=payload.encode('utf-8')):
+            if line == "__END__":
+                outputs.append(lines)
+                lines = []
+            else:
+                lines.append(line)
+
+        if len(outputs) != len(batches):
+            raise RuntimeError("The Perl driver exited before answering every batch")
+        return outputs
+
+    def _command_results(self, keys):
+        """
+        Computes cache keys with the SIM, PATH and LCS commands of the Perl driver.
+
+        All the keys are answered with a single UMLS interface load, one batch per kind 
+        of key, by `_run_command_batches`.
+
+        Args:
+            keys (list of tuple): Cache keys, as used by `_cached_results`.
+
+        Returns:
+            dict: The result for every key the driver answered.
+        """
+        batches = []
+        parsers = []
+        sim_keys = [key for key in keys if key[0] == 'SIM']
+        for precision in dict.fromkeys(key[2] for key in sim_keys):
+            # Unlike the --infile driver, the worker scores exactly the keys it is sent
+            batch_keys = [key for key in sim_keys if key[2] == precision]
+            batches.append([f"SIM<>{measure}<>{precision}<>{cui1}<>{cui2}" for _, measure, _, cui1, cui2 in batch_keys])
+            pairs = list(dict.fromkeys(key[3:] for key in batch_keys))
+            measures = list(dict.fromkeys(key[1] for key in batch_keys))
+            parsers.append(lambda lines, measures=measures, precision=precision, pairs=pairs:
+                           self._similarity_results(lines, measures, precision, pairs))
+
+        for kind, parse in (('PATH', self._shortest_path_rows), ('LCS', self._least_common_subsumer_rows)):
+            pairs = [key[1:] for key in keys if key[0] == kind]
+            if pairs:
+                batches.append([f"{kind}<>{pair}" for pair in self._pair_lines(pairs)])
+                parsers.append(lambda lines, kind=kind, parse=parse, pairs=pairs:
+                               {(kind,) + pair: row for pair, row in parse(lines, pairs).items()})
+
+        results = {}
+        for parse, lines in zip(parsers, self._run_command_batches(batches)):
+            results.update(parse(lines))
+        return results
+
+    def close(self):
+        """
+        Stops the persistent Perl workers, if any are running, and removes the Perl driver.
+
+        Workers that are busy are stopped once they finish their current request.
+        """
+        for _ in range(self._worker_count):
+            worker = self._worker_pool.get()
+            if worker is not None:
+                worker.stdin.close()
+                worker.wait()
+            self._worker_pool.put(None)
+
+        with self._script_lock:
+            if self._script_dir is not None:
+                self._script_dir.cleanup()
+                self._script_dir = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
     def find_shortest_path(self, cui_pairs, forcerun=True):
         """
         Calculates the shortest path between pairs of CUIs.
 
-        This method writes CUI pairs to a temporary file and then calls 
-        `find_shortest_path_from_file` to calculate the shortest path for each pair.
+        This method writes CUI pairs to a temporary file and then runs 
+        findShortestPath.pl on it, as `find_shortest_path_from_file` does, which 
+        calculates the shortest path for every pair in a single Perl invocation.
+        Pairs this instance has already looked up are answered from its cache.
 
         Args:
             cui_pairs (list of tuple): A list of tuples, where each tuple contains two CUIs.
@@ -202,13 +1126,16 @@ class PyUMLS_Similarity:
             pandas.DataFrame: A DataFrame containing the shortest path results, including 
                             the terms, CUIs, path length, and the path itself.
         """
-        in_file_path = tempfile.gettempdir() + r"\umls-similarity-temp.txt"
-        with open(in_file_path, 'w', encoding='utf-8') as f_out:
-            for cui1, cui2 in cui_pairs:
-                f_out.write(f"{cui1}<>{cui2}\n")
-
-        return self.find_shortest_path_from_file(in_file_path, cui_pairs)
+        def compute(keys):
+            if self.persistent:
+                return self._command_results(keys)
+            pairs = [key[1:] for key in keys]
+            with self._pairs_file(pairs) as in_file_path:
+                rows = self._shortest_path_rows(self._shortest_path_lines(in_file_path, forcerun), pairs)
+            return {('PATH',) + pair: row for pair, row in rows.items()}
 
+        results = self._cached_results([('PATH',) + pair for pair in self._unique_pairs(cui_pairs)], compute)
+        return self._path_frame({key[1:]: row for key, row in results.items()}, cui_pairs)
 
     def find_shortest_path_from_file(self,in_file,cui_pairs,forcerun=True,verbose=False):
         """
@@ -227,13 +1154,28 @@ class PyUMLS_Similarity:
             pandas.DataFrame: A DataFrame containing the shortest path results, including 
                             the terms, CUIs, path length, and the path itself.
         """
+        if self.persistent:
+            return self._worker_shortest_path(self._read_pairs_file(in_file), cui_pairs)
+
+        lines = self._shortest_path_lines(in_file, forcerun, verbose)
+        if verbose:
+            lines = list(lines)
+            print("\n".join(lines))
+        return self._parse_shortest_path_output(lines, cui_pairs)
+
+    def _shortest_path_lines(self, in_file, forcerun=True, verbose=False):
+        """
+        Runs findShortestPath.pl on a file containing CUI pairs and yields its output lines.
 
+        Args:
+            in_file (str): Path to the file containing CUI pairs.
+            forcerun (bool): If True, forces the calculation to run even if it might have been previously computed.
+            verbose (bool): If True, prints additional debugging information.
+
+        Yields:
+            str: One line of output, as it is written.
+        """
         umls_sim_params = {}
-        umls_sim_params["--database"] = self.mysql_info["database"]
-        umls_sim_params["--username"] =self.mysql_info["username"]
-        umls_sim_params["--password"] = self.mysql_info["password"]
-        umls_sim_params["--hostname"] =self.mysql_info["hostname"]
-        umls_sim_params["--socket"]  = self.mysql_info["socket"]
         umls_sim_params["--length"] = ""
 
         if forcerun:
@@ -241,57 +1183,105 @@ class PyUMLS_Similarity:
  
         umls_sim_params["--infile"] = in_file
 
-        cwd = r'C:\Strawberry\perl\site\bin'
-        umls_similarity_script_path =cwd+ r"\findShortestPath.pl"
+        cwd = self._perl_script_dir
+        umls_similarity_script_path = self._shortest_path_script
         # new_env["WNHome"] = r'C:\Program Files (x86)\WordNet\2.1'
 
-        process_args = [self.perl_bin_path, umls_similarity_script_path]
-        for key, value in umls_sim_params.items():
-            if value:  # Checks if value is not empty
-                process_args.append(key + "=" + value)
-            else:
-                process_args.append(key)
-        kv_str = " ".join(process_args)
-        print(kv_str)
+        # Flags with an empty value are passed bare, e.g. --forcerun
+        process_args = [self.perl_bin_path, umls_similarity_script_path, *self._mysql_argv]
+        process_args += [f"{key}={value}" if value else key for key, value in umls_sim_params.items()]
+        if verbose:
+            print(" ".join(process_args))
 
-        process = subprocess.Popen(process_args, cwd=cwd, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        stdout, stderr = process.communicate()
-        if stderr and verbose:
-            print("Error:\n", stderr.strip())
+        # stderr is only captured when it is going to be printed
+        process = self._popen(process_args, cwd, verbose)
 
-        # Decode stdout from bytes to string
-        output = stdout.decode('utf-8')
-        print(output)
+        # Parse each line as Perl writes it instead of buffering the whole output
+        return self._stream_stdout_lines(process, verbose)
 
-        # Process the output and extract data
-        data = []
+    def _parse_shortest_path_output(self, lines, cui_pairs):
+        """
+        Builds the shortest path DataFrame from findShortestPath.pl output.
+
+        Args:
+            lines (iterable of str): The output lines of the shortest path calculation.
+            cui_pairs (list of tuple): The CUI pairs that were submitted.
+
+        Returns:
+            pandas.DataFrame: The shortest path results, one row per CUI pair.
+        """
+        return self._path_frame(self._shortest_path_rows(lines, cui_pairs), cui_pairs)
+
+    def _shortest_path_rows(self, lines, cui_pairs):
+        """
+        Matches findShortestPath.pl output to the pairs it answers.
+
+        Args:
+            lines (iterable of str): The output lines of the shortest path calculation.
+            cui_pairs (list of tuple): The CUI pairs that were submitted.
+
+        Returns:
+            dict: A row for every pair the output has a path or a 'no path' message for, keyed by pair.
+        """
+        # Index the first record for every pair in a single pass over the output lines,
+        # keyed by the printed terms and by the CUIs so that CUI inputs are found too
+        hits = {}
+        misses = set()
+        record = None
+        for line in lines:
+            line = line.strip()
+            hit = _PATH_HIT_RE.match(line)
+            if hit:
+                path_length, printed1, cui1, printed2, cui2 = hit.groups()
+                record = (cui1, cui2, path_length, [])
+                hits.setdefault((printed1, printed2), record)
+                hits.setdefault((cui1, cui2), record)
+            elif record is not None and line.startswith('=>'):
+                record[3].extend(_CUI_RE.findall(line))
+            else:
+                record = None
+                miss = _PATH_MISS_RE.match(line)
+                if miss:
+                    misses.add(miss.group(1))
+
+        rows = {}
         for pair in cui_pairs:
             term1, term2 = pair
-            # Regex patterns for path and special no-path message
-            path_pattern = re.escape(term1) + r' \((.+?)\) and ' + re.escape(term2) + r' \((.+?)\):(?:\s+=>\s+.+?)*'
-            no_path_pattern = r'There is not a path between ' + re.escape(term1) + r' and ' + re.escape(term2)
-
-            path_match = re.search(path_pattern, output)
-            no_path_match = re.search(no_path_pattern, output)
-
-            if path_match:
-                # Extract the CUIs and path length
-                cui1 = path_match.group(1)
-                cui2 = path_match.group(2)
-                path = self.extract_path(output, term1, term2)
-                # Extract the path length from the match
-                path_length_match = re.search(r'length: (\d+)', path_match.group(0))
-                path_length = path_length_match.group(1) if path_length_match else 'N/A'
-            elif no_path_match:
+            record = hits.get((term1, term2))
+            if record:
+                cui1, cui2, path_length, steps = record
+                if steps and steps[0] == cui1 and steps[-1] == cui2:
+                    path = ' => '.join(steps)
+                else:
+                    path = 'Inconsistent path'
+            elif f"{term1} and {term2}" in misses:
                 cui1, cui2, path_length, path = 'N/A', 'N/A', 'N/A', 'Path not found'
             else:
-                cui1, cui2, path_length, path = 'N/A', 'N/A', 'N/A', 'No information'
+                continue
+            rows[tuple(pair)] = {'Term 1': term1, 'Term 2': term2, 'CUI 1': cui1, 'CUI 2': cui2,
+                                 'Path Length': path_length, 'Path': path}
+        return rows
+
+    def _path_frame(self, rows, cui_pairs):
+        """
+        Builds the shortest path DataFrame for the given pairs, with 'No information' for pairs without a row.
 
-            data.append([term1, term2, cui1, cui2, path_length, path])
+        Args:
+            rows (dict): Rows keyed by pair, as returned by `_shortest_path_rows`.
+            cui_pairs (list of tuple): A list of tuples, where each tuple contains two CUIs.
 
-        # Creating the DataFrame
-        df = pd.DataFrame(data, columns=['Term 1', 'Term 2', 'CUI 1', 'CUI 2', 'Path Length', 'Path'])
-        return df
+        Returns:
+            pandas.DataFrame: The shortest path results, one row per CUI pair.
+        """
+        records = []
+        for pair in cui_pairs:
+            row = rows.get(tuple(pair))
+            if row is None:
+                term1, term2 = pair
+                row = {'Term 1': term1, 'Term 2': term2, 'CUI 1': 'N/A', 'CUI 2': 'N/A',
+                       'Path Length': 'N/A', 'Path': 'No information'}
+            records.append(row)
+        return pd.DataFrame(records, columns=_PATH_COLUMNS)
 
     def extract_path(self, output, term1, term2):
         """
@@ -316,7 +1306,7 @@ class PyUMLS_Similarity:
             cui2 = path_match.group(2)
             path_segment = path_match.group(3).strip()
             # Extract CUIs from the path segment
-            steps = re.findall(r'C\d{7}', path_segment)
+            steps = _CUI_RE.findall(path_segment)
             if steps and steps[0] == cui1 and steps[-1] == cui2:
                 return ' => '.join(steps)
             else:
@@ -330,7 +1320,8 @@ class PyUMLS_Similarity:
 
         This method writes CUI pairs to a temporary file and uses an external Perl script to
         calculate the LCS for each pair. The LCS is the most specific concept that is an ancestor 
-        of both concepts in the UMLS hierarchy.
+        of both concepts in the UMLS hierarchy. Pairs this instance has already looked up 
+        are answered from its cache.
 
         Args:
             cui_pairs (list of tuple): A list of tuples, where each tuple contains two CUIs.
@@ -339,12 +1330,16 @@ class PyUMLS_Similarity:
             pandas.DataFrame: A DataFrame containing the LCS results for each CUI pair, 
                             including the terms, CUIs, LCS, and its minimum and maximum depth.
         """
-        in_file_path = tempfile.gettempdir() + r"\umls-similarity-temp.txt"
-        with open(in_file_path, 'w', encoding='utf-8') as f_out:
-            for cui1, cui2 in cui_pairs:
-                f_out.write(f"{cui1}<>{cui2}\n")
+        def compute(keys):
+            if self.persistent:
+                return self._command_results(keys)
+            pairs = [key[1:] for key in keys]
+            with self._pairs_file(pairs) as in_file_path:
+                rows = self._least_common_subsumer_rows(self._least_common_subsumer_lines(in_file_path), pairs)
+            return {('LCS',) + pair: row for pair, row in rows.items()}
 
-        return self.find_least_common_subsumer_from_file(in_file_path,cui_pairs)
+        results = self._cached_results([('LCS',) + pair for pair in self._unique_pairs(cui_pairs)], compute)
+        return self._lcs_frame({key[1:]: row for key, row in results.items()}, cui_pairs)
 
     def find_least_common_subsumer_from_file(self, in_file,cui_pairs,forcerun=True,verbose=False):
         """
@@ -363,13 +1358,26 @@ class PyUMLS_Similarity:
             pandas.DataFrame: A DataFrame containing the LCS results for each CUI pair, 
                             including the terms, CUIs, LCS, and its minimum and maximum depth.
         """
+        if self.persistent:
+            return self._worker_least_common_subsumer(self._read_pairs_file(in_file), cui_pairs)
+
+        lines = self._least_common_subsumer_lines(in_file, forcerun, verbose)
+        return self._parse_least_common_subsumer_output(lines, cui_pairs)
+
+    def _least_common_subsumer_lines(self, in_file, forcerun=True, verbose=False):
+        """
+        Runs findLeastCommonSubsumer.pl on a file containing CUI pairs and yields its output lines.
+
+        Args:
+            in_file (str): Path to the file containing CUI pairs.
+            forcerun (bool): If True, forces the calculation to run even if it might have been previously computed.
+            verbose (bool): If True, prints additional debugging information.
+
+        Yields:
+            str: One line of output, as it is written.
+        """
         # Setup for calling the Perl script
         umls_sim_params = {}
-        umls_sim_params["--database"] = self.mysql_info["database"]
-        umls_sim_params["--username"] = self.mysql_info["username"]
-        umls_sim_params["--password"] = self.mysql_info["password"]
-        umls_sim_params["--hostname"] = self.mysql_info["hostname"]
-        umls_sim_params["--socket"]   = self.mysql_info["socket"]
         umls_sim_params["--depth"]    = ""
 
         if forcerun:
@@ -377,45 +1385,87 @@ class PyUMLS_Similarity:
  
         umls_sim_params["--infile"] = in_file
 
-        cwd = r'C:\Strawberry\perl\site\bin'
-        umls_similarity_script_path =cwd+ r"\findLeastCommonSubsumer.pl"
+        cwd = self._perl_script_dir
+        umls_similarity_script_path = self._lcs_script
         # new_env["WNHome"] = r'C:\Program Files (x86)\WordNet\2.1'
 
-        process_args = [self.perl_bin_path, umls_similarity_script_path]
-        for key, value in umls_sim_params.items():
-            if value:  # Checks if value is not empty
-                process_args.append(key + "=" + value)
-            else:
-                process_args.append(key)
-        kv_str = " ".join(process_args)
-        print(kv_str)
-        #print(ps)
-        process = subprocess.Popen(process_args, cwd=cwd, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        stdout, stderr = process.communicate()
-        if stderr and verbose:
-            print("Error:\n", stderr.strip())
-
-        # Decode stdout from bytes to string
-        output = stdout.decode('utf-8')
-        #print(output)
-
-        # Process the output and extract data
-        data = []
+        # Flags with an empty value are passed bare, e.g. --forcerun
+        process_args = [self.perl_bin_path, umls_similarity_script_path, *self._mysql_argv]
+        process_args += [f"{key}={value}" if value else key for key, value in umls_sim_params.items()]
+        if verbose:
+            print(" ".join(process_args))
+        # stderr is only captured when it is going to be printed
+        process = self._popen(process_args, cwd, verbose)
+
+        # Parse each line as Perl writes it instead of buffering the whole output
+        return self._stream_stdout_lines(process, verbose)
+
+    def _parse_least_common_subsumer_output(self, lines, cui_pairs):
+        """
+        Builds the LCS DataFrame from findLeastCommonSubsumer.pl output.
+
+        Args:
+            lines (iterable of str): The output lines of the LCS calculation.
+            cui_pairs (list of tuple): The CUI pairs that were submitted.
+
+        Returns:
+            pandas.DataFrame: The LCS results for the pairs that have one.
+        """
+        return self._lcs_frame(self._least_common_subsumer_rows(lines, cui_pairs), cui_pairs)
+
+    def _least_common_subsumer_rows(self, lines, cui_pairs):
+        """
+        Matches findLeastCommonSubsumer.pl output to the pairs it answers.
+
+        Args:
+            lines (iterable of str): The output lines of the LCS calculation.
+            cui_pairs (list of tuple): The CUI pairs that were submitted.
+
+        Returns:
+            dict: A row for every pair the output has an LCS for, and _NO_ROW for every pair 
+                it reports as having none, keyed by pair.
+        """
+        # Index the first LCS for every pair in one scan, keyed by the printed terms 
+        # and by the CUIs so that CUI inputs are found too
+        lcs_records = {}
+        misses = set()
+        for line in lines:
+            lcs_match = _LCS_RE.search(line)
+            if lcs_match:
+                printed1, cui1, printed2, cui2, lcs_term, lcs_cui, min_depth, max_depth = lcs_match.groups()
+                record = (cui1, cui2, lcs_term + ' (' + lcs_cui + ')', min_depth, max_depth)
+                lcs_records.setdefault((printed1, printed2), record)
+                lcs_records.setdefault((cui1, cui2), record)
+                continue
+            miss = _LCS_MISS_RE.search(line)
+            if miss:
+                misses.add(miss.group(1))
+
+        rows = {}
         for pair in cui_pairs:
             term1, term2 = pair
-            lcs_pattern = r'The least common subsumer between ' + re.escape(term1) + r' \((.+?)\) and ' + re.escape(term2) + r' \((.+?)\) is (.+?) \((.+?)\) with a min and max depth of (\d+) and (\d+)'
-            lcs_match = re.search(lcs_pattern, output)
-            if lcs_match:
-                cui1 = lcs_match.group(1)
-                cui2 = lcs_match.group(2)
-                lcs = lcs_match.group(3) + ' (' + lcs_match.group(4) + ')'
-                min_depth = lcs_match.group(5)
-                max_depth = lcs_match.group(6)
-                data.append([term1, term2, cui1, cui2, lcs, min_depth, max_depth])
+            record = lcs_records.get((term1, term2))
+            if record:
+                cui1, cui2, lcs, min_depth, max_depth = record
+                rows[tuple(pair)] = {'Term 1': term1, 'Term 2': term2, 'CUI 1': cui1, 'CUI 2': cui2,
+                                     'LCS': lcs, 'Min Depth': min_depth, 'Max Depth': max_depth}
+            elif f"{term1} and {term2}" in misses:
+                rows[tuple(pair)] = _NO_ROW
+        return rows
+
+    def _lcs_frame(self, rows, cui_pairs):
+        """
+        Builds the LCS DataFrame for the given pairs, leaving out pairs without an LCS.
 
-        # Creating the DataFrame
-        df = pd.DataFrame(data, columns=['Term 1', 'Term 2', 'CUI 1', 'CUI 2', 'LCS', 'Min Depth', 'Max Depth'])
-        return df
+        Args:
+            rows (dict): Rows keyed by pair, as returned by `_least_common_subsumer_rows`.
+            cui_pairs (list of tuple): A list of tuples, where each tuple contains two CUIs.
+
+        Returns:
+            pandas.DataFrame: The LCS results for the pairs that have one.
+        """
+        records = [rows.get(tuple(pair), _NO_ROW) for pair in cui_pairs]
+        return pd.DataFrame([row for row in records if row is not _NO_ROW], columns=_LCS_COLUMNS)
 
     def get_all_measures(self):
         """
@@ -436,6 +1486,8 @@ class PyUMLS_Similarity:
 
         This method takes a list of tasks, where each task is a dictionary specifying a function to run
         and its arguments. It uses multithreading to run these tasks concurrently, improving efficiency.
+        Similarity, shortest path and LCS tasks on the same CUI pairs are run together by 
+        `run_fused_tasks`, so the UMLS interface is only loaded once for them.
 
         Args:
             tasks (list of dict): A list of tasks, where each task is a dictionary containing
@@ -444,25 +1496,138 @@ class PyUMLS_Similarity:
         Returns:
             dict: A dictionary with function names as keys and the results of the function calls as values.
         """
-        with ThreadPoolExecutor() as executor:
-            future_to_task = {executor.submit(self.run_task, task): task for task in tasks}
+        # Tasks on the same pairs share one Perl start-up instead of one each
+        groups = {}
+        for task in tasks:
+            groups.setdefault(self._task_pairs_key(task), []).append(task)
+
+        task_groups = []
+        for key, group in groups.items():
+            function_names = [task['function'] for task in group]
+            if key is not None and len(group) > 1 and len(set(function_names)) == len(group):
+                task_groups.append(group)
+            else:
+                task_groups.extend([task] for task in group)
+
+        # Each group keeps one Perl process busy, so more threads than groups or cores only adds contention
+        max_workers = max(1, min(len(task_groups), os.cpu_count() or 4))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            future_to_group = {executor.submit(self._run_task_group, group): group for group in task_groups}
 
             results = {}
             # Initialize tqdm progress bar
             with tqdm(total=len(tasks), desc="Processing tasks", unit="task") as progress_bar:
-                for future in as_completed(future_to_task):
-                    task = future_to_task[future]
+                for future in as_completed(future_to_group):
+                    group = future_to_group[future]
                     try:
-                        results[task['function']] = future.result()
-                    except Exception as e:
-                        print(f"Task {task['function']} generated an exception: {e}")
+                        group_results, errors = future.result()
+                        results.update(group_results)
+                        for function_name, e in errors.items():
+                            print(f"Task {function_name} generated an exception: {e}")
                     finally:
-                        progress_bar.update(1)  # Update progress bar after each task completion
+                        progress_bar.update(len(group))  # Update progress bar after each group completion
 
             # Merge the DataFrames if they exist
             final_df = self.merge_results(results)
             return final_df
 
+    def _run_task_group(self, group):
+        """
+        Runs a group of tasks built by `run_concurrently`.
+
+        A group of several tasks is run by `run_fused_tasks`. If that fails, every task 
+        is run again on its own, so that one failing task does not lose the results of 
+        the others.
+
+        Args:
+            group (list of dict): Tasks as accepted by `run_task`.
+
+        Returns:
+            tuple: A dict with the results and a dict with the exceptions, both keyed by function name.
+        """
+        if len(group) > 1:
+            try:
+                return self.run_fused_tasks(group), {}
+            except Exception:
+                pass
+
+        results = {}
+        errors = {}
+        for task in group:
+            try:
+                results[task['function']] = self.run_task(task)
+            except Exception as e:
+                errors[task['function']] = e
+        return results, errors
+
+    def _task_pairs_key(self, task):
+        """
+        Returns a hashable key for the CUI pairs a task works on.
+
+        Args:
+            task (dict): A task as accepted by `run_task`.
+
+        Returns:
+            tuple or None: The pairs as a tuple of tuples, or None if the task cannot be fused.
+        """
+        arguments = task.get('arguments', ())
+        try:
+            if task['function'] == 'similarity':
+                # The fused driver always runs with --forcerun, so a task without it runs on its own
+                if len(arguments) > 3 and not arguments[3]:
+                    return None
+                cui_pairs = arguments[0]
+            elif task['function'] in ('shortest_path', 'lcs'):
+                cui_pairs = arguments
+            else:
+                return None
+            return tuple((cui1, cui2) for cui1, cui2 in cui_pairs)
+        except (TypeError, ValueError, IndexError):
+            return None
+
+    def run_fused_tasks(self, tasks):
+        """
+        Executes similarity, shortest path and LCS tasks on the same CUI pairs with one Perl start-up.
+
+        The Perl driver loads the UMLS interface once and answers every requested 
+        operation, and its output is split back into one result per task. Results this 
+        instance has already computed are taken from its cache instead.
+
+        Args:
+            tasks (list of dict): Tasks as accepted by `run_task`, all on the same CUI pairs 
+                                and each with a different function.
+
+        Returns:
+            dict: A dictionary with function names as keys and the results of the tasks as values.
+        """
+        cui_pairs = list(self._task_pairs_key(tasks[0]))
+        unique_pairs = self._unique_pairs(cui_pairs)
+
+        keys = []
+        builders = []
+        for task in tasks:
+            function_name = task['function']
+            if function_name == 'similarity':
+                arguments = task.get('arguments', ())
+                measures = list(dict.fromkeys(arguments[1] if len(arguments) > 1 else ['lch']))
+                precision = arguments[2] if len(arguments) > 2 else 4
+                keys += [('SIM', measure, precision) + pair for measure in measures for pair in unique_pairs]
+                builders.append(lambda results, measures=measures, precision=precision:
+                                self._similarity_frame(results, cui_pairs, measures, precision))
+            elif function_name == 'shortest_path':
+                keys += [('PATH',) + pair for pair in unique_pairs]
+                builders.append(lambda results: self._path_frame(
+                    {key[1:]: row for key, row in results.items() if key[0] == 'PATH'}, cui_pairs))
+            elif function_name == 'lcs':
+                keys += [('LCS',) + pair for pair in unique_pairs]
+                builders.append(lambda results: self._lcs_frame(
+                    {key[1:]: row for key, row in results.items() if key[0] == 'LCS'}, cui_pairs))
+            else:
+                raise ValueError(f"Unknown function: {function_name}")
+
+        results = self._cached_results(keys, self._command_results)
+        return {task['function']: build(results) for task, build in zip(tasks, builders)}
+
     def merge_results(self, results):
         """
         Merges the result DataFrames from different tasks.
@@ -478,12 +1643,20 @@ class PyUMLS_Similarity:
             if key in results:
                 dataframes.append(results[key])
 
-        if dataframes:
-            # Merge all DataFrames on the specified columns
-            final_df = dataframes[0]
-            for df in dataframes[1:]:
-                final_df = pd.merge(final_df, df, on=['Term 1', 'Term 2', 'CUI 1', 'CUI 2'], how='outer')
-            return final_df
+        if len(dataframes) == 1:
+            # Nothing to align a single result with
+            return dataframes[0]
+        elif dataframes:
+            # Index every DataFrame by the key columns plus an occurrence number, so that
+            # repeated pairs line up one-to-one instead of multiplying out, then join them 
+            # all with a single concat instead of one outer merge per DataFrame
+            merge_on = ['Term 1', 'Term 2', 'CUI 1', 'CUI 2']
+            indexed = []
+            for df in dataframes:
+                occurrence = df.groupby(merge_on, sort=False, dropna=False).cumcount().rename('Occurrence')
+                indexed.append(df.set_index(merge_on + [occurrence]))
+            final_df = pd.concat(indexed, axis=1, join='outer')
+            return final_df.reset_index(level='Occurrence', drop=True).reset_index()
         else:
             return pd.DataFrame()  # Return an empty DataFrame if no results
 
@@ -503,12 +1676,11 @@ class PyUMLS_Similarity:
         """
         function_name = task['function']
         arguments = task.get('arguments', ())
-        
-        if function_name == 'similarity':
-            return self.similarity(*arguments)
-        elif function_name == 'shortest_path':
-            return self.find_shortest_path(arguments)
-        elif function_name == 'lcs':
-            return self.find_least_common_subsumer(arguments)
-        else:
+
+        if function_name not in self._TASK_FUNCTIONS:
             raise ValueError(f"Unknown function: {function_name}")
+        method_name, unpack_arguments = self._TASK_FUNCTIONS[function_name]
+        function = getattr(self, method_name)
+        if unpack_arguments:
+            return function(*arguments)
+        return function(arguments)
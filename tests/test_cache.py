@@ -0,0 +1,174 @@
+"""
+Tests for the result cache shared by similarity, shortest path and LCS lookups.
+
+Perl is replaced by fake compute functions and a stubbed `_run_command_batches`.
+"""
+import threading
+
+import pytest
+
+from PyUMLS_Similarity import PyUMLS_Similarity, _NO_ROW
+
+MYSQL_INFO = {
+    "database": "umls",
+    "username": "user",
+    "password": "password",
+    "hostname": "localhost",
+    "socket": "MYSQL",
+}
+
+
+@pytest.fixture
+def umls_sim():
+    return PyUMLS_Similarity(MYSQL_INFO)
+
+
+def test_cached_results_only_computes_missing_keys(umls_sim):
+    calls = []
+
+    def compute(keys):
+        calls.append(list(keys))
+        return {key: key[-1].upper() for key in keys}
+
+    assert umls_sim._cached_results([('PATH', 'a', 'b'), ('PATH', 'c', 'd')], compute) == {
+        ('PATH', 'a', 'b'): 'B', ('PATH', 'c', 'd'): 'D'}
+    umls_sim._cached_results([('PATH', 'c', 'd'), ('PATH', 'e', 'f'), ('PATH', 'e', 'f')], compute)
+
+    assert calls == [[('PATH', 'a', 'b'), ('PATH', 'c', 'd')], [('PATH', 'e', 'f')]]
+
+
+def test_cached_results_does_not_cache_missing_results(umls_sim):
+    calls = []
+
+    def compute(keys):
+        calls.append(list(keys))
+        return {key: _NO_ROW for key in keys if key[1] == 'a'}
+
+    results = umls_sim._cached_results([('LCS', 'a', 'b'), ('LCS', 'c', 'd')], compute)
+    umls_sim._cached_results([('LCS', 'a', 'b'), ('LCS', 'c', 'd')], compute)
+
+    assert results == {('LCS', 'a', 'b'): _NO_ROW}
+    assert calls == [[('LCS', 'a', 'b'), ('LCS', 'c', 'd')], [('LCS', 'c', 'd')]]
+
+
+def test_cached_results_releases_keys_when_compute_raises(umls_sim):
+    def fail(keys):
+        raise RuntimeError("Perl died")
+
+    with pytest.raises(RuntimeError):
+        umls_sim._cached_results([('PATH', 'a', 'b')], fail)
+
+    assert umls_sim._result_cache == {}
+    assert umls_sim._cached_results([('PATH', 'a', 'b')], lambda keys: {keys[0]: 'row'}) == {('PATH', 'a', 'b'): 'row'}
+
+
+def test_cached_results_waits_for_keys_in_flight(umls_sim):
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def slow(keys):
+        calls.append(list(keys))
+        started.set()
+        release.wait(5)
+        return {key: 'slow' for key in keys}
+
+    def fast(keys):
+        calls.append(list(keys))
+        return {key: 'fast' for key in keys}
+
+    first = threading.Thread(target=umls_sim._cached_results, args=([('PATH', 'a', 'b')], slow))
+    first.start()
+    started.wait(5)
+    results = {}
+    second = threading.Thread(target=lambda: results.update(
+        umls_sim._cached_results([('PATH', 'a', 'b'), ('PATH', 'c', 'd')], fast)))
+    second.start()
+    second.join(0.2)
+    # The second caller computes its own key but waits for the one in flight
+    assert second.is_alive()
+    release.set()
+    first.join(5)
+    second.join(5)
+
+    assert results == {('PATH', 'a', 'b'): 'slow', ('PATH', 'c', 'd'): 'fast'}
+    assert calls == [[('PATH', 'a', 'b')], [('PATH', 'c', 'd')]]
+
+
+def test_cached_results_retries_keys_another_thread_failed(umls_sim):
+    started = threading.Event()
+    release = threading.Event()
+
+    def failing(keys):
+        started.set()
+        release.wait(5)
+        raise RuntimeError("Perl died")
+
+    def first():
+        with pytest.raises(RuntimeError):
+            umls_sim._cached_results([('PATH', 'a', 'b')], failing)
+
+    thread = threading.Thread(target=first)
+    thread.start()
+    started.wait(5)
+    results = {}
+    second = threading.Thread(target=lambda: results.update(
+        umls_sim._cached_results([('PATH', 'a', 'b')], lambda keys: {key: 'row' for key in keys})))
+    second.start()
+    release.set()
+    thread.join(5)
+    second.join(5)
+
+    assert results == {('PATH', 'a', 'b'): 'row'}
+
+
+def _score_line(measure, pair):
+    return f"{measure}<>0.5000<>{pair[0]}<>{pair[1]}<>{pair[0]}<>{pair[1]}"
+
+
+@pytest.fixture
+def persistent_sim(monkeypatch):
+    # Answers SIM commands like the Perl driver, leaving out pairs with a 'skip' input
+    batches_run = []
+
+    def run_command_batches(self, batches):
+        batches_run.append(batches)
+        outputs = []
+        for commands in batches:
+            lines = []
+            for command in commands:
+                _, measure, _, cui1, cui2 = command.split('<>')
+                if 'skip' not in (cui1, cui2):
+                    lines.append(_score_line(measure, (cui1, cui2)))
+            outputs.append(lines)
+        return outputs
+
+    monkeypatch.setattr(PyUMLS_Similarity, "_run_command_batches", run_command_batches)
+    umls_sim = PyUMLS_Similarity(MYSQL_INFO, persistent=True)
+    umls_sim.batches_run = batches_run
+    return umls_sim
+
+
+def test_similarity_only_sends_missing_pairs_and_measures(persistent_sim):
+    persistent_sim.similarity([('a', 'b'), ('c', 'd')], ['lch'])
+    df = persistent_sim.similarity([('a', 'b'), ('c', 'd'), ('e', 'f'), ('a', 'b')], ['lch', 'wup'])
+
+    assert persistent_sim.batches_run[1] == [[
+        'SIM<>lch<>4<>e<>f', 'SIM<>wup<>4<>a<>b', 'SIM<>wup<>4<>c<>d', 'SIM<>wup<>4<>e<>f']]
+    assert list(df['lch']) == ['0.5000'] * 4
+    assert list(df['wup']) == ['0.5000'] * 4
+
+
+def test_similarity_cache_is_per_precision(persistent_sim):
+    persistent_sim.similarity([('a', 'b')], ['lch'], precision=4)
+    persistent_sim.similarity([('a', 'b')], ['lch'], precision=2)
+
+    assert persistent_sim.batches_run == [[['SIM<>lch<>4<>a<>b']], [['SIM<>lch<>2<>a<>b']]]
+
+
+def test_similarity_pairs_without_a_score_are_not_cached(persistent_sim):
+    df = persistent_sim.similarity([('a', 'b'), ('skip', 'd')], ['lch'])
+    persistent_sim.similarity([('a', 'b'), ('skip', 'd')], ['lch'])
+
+    assert list(df['lch']) == ['0.5000', 'N/A']
+    assert persistent_sim.batches_run[1] == [['SIM<>lch<>4<>skip<>d']]
@@ -0,0 +1,205 @@
+"""
+Tests for the functions that turn Perl output into DataFrames.
+
+The output below is copied from findShortestPath.pl --length, findLeastCommonSubsumer.pl --depth
+and the umls-similarity-batch.pl driver, so no Perl or MySQL is needed to run them.
+"""
+import pandas as pd
+import pytest
+
+from PyUMLS_Similarity import PyUMLS_Similarity, _NO_ROW
+
+MYSQL_INFO = {
+    "database": "umls",
+    "username": "user",
+    "password": "password",
+    "hostname": "localhost",
+    "socket": "MYSQL",
+}
+
+SHORTEST_PATH_OUTPUT = """
+The shortest path (length: 3) between Hand (C0018563) and Skull (C0037303):
+  => C0018563 (Hand) C0002807 (Anatomy) C0037303 (Skull)
+
+The shortest path (length: 3) between hand (C0018563) and skull (C0037303):
+  => C0018563 (Hand) C0002807 (Anatomy) C0037303 (Skull)
+
+There is not a path between foo and bar
+given the current view of the UMLS.
+
+"""
+
+LCS_OUTPUT = """
+The least common subsumer between Hand (C0018563) and Skull (C0037303) is Anatomy (C0002807) with a min and max depth of 5 and 6
+
+The least common subsumer between hand (C0018563) and skull (C0037303) is Anatomy (C0002807) with a min and max depth of 5 and 6
+
+There is not a least common subsumer between foo and bar given the current view of the UMLS.
+
+"""
+
+
+@pytest.fixture
+def umls_sim():
+    return PyUMLS_Similarity(MYSQL_INFO)
+
+
+def test_shortest_path_fills_length_and_path(umls_sim):
+    df = umls_sim._parse_shortest_path_output(SHORTEST_PATH_OUTPUT.splitlines(), [("hand", "skull")])
+
+    assert df.to_dict('records') == [{
+        'Term 1': 'hand', 'Term 2': 'skull', 'CUI 1': 'C0018563', 'CUI 2': 'C0037303',
+        'Path Length': '3', 'Path': 'C0018563 => C0002807 => C0037303',
+    }]
+
+
+def test_shortest_path_finds_cui_inputs(umls_sim):
+    # For CUI inputs the script prints the preferred term, not the input
+    df = umls_sim._parse_shortest_path_output(SHORTEST_PATH_OUTPUT.splitlines(), [("C0018563", "C0037303")])
+
+    assert df.loc[0, 'Path Length'] == '3'
+    assert df.loc[0, 'Path'] == 'C0018563 => C0002807 => C0037303'
+
+
+def test_shortest_path_no_path_and_missing_output(umls_sim):
+    pairs = [("foo", "bar"), ("C0000001", "C0000002")]
+    df = umls_sim._parse_shortest_path_output(SHORTEST_PATH_OUTPUT.splitlines(), pairs)
+
+    assert list(df['Path']) == ['Path not found', 'No information']
+    assert list(df['Path Length']) == ['N/A', 'N/A']
+    assert list(df['CUI 1']) == ['N/A', 'N/A']
+
+
+def test_shortest_path_repeated_pairs_keep_one_row_each(umls_sim):
+    pairs = [("hand", "skull"), ("foo", "bar"), ("hand", "skull")]
+    df = umls_sim._parse_shortest_path_output(SHORTEST_PATH_OUTPUT.splitlines(), pairs)
+
+    assert list(zip(df['Term 1'], df['Term 2'])) == pairs
+    assert list(df['Path Length']) == ['3', 'N/A', '3']
+
+
+def test_shortest_path_rows_leave_out_unanswered_pairs(umls_sim):
+    # Only pairs the output answers are cached, so a pair Perl never got to is looked up again
+    pairs = [("hand", "skull"), ("foo", "bar"), ("C0000001", "C0000002")]
+    rows = umls_sim._shortest_path_rows(SHORTEST_PATH_OUTPUT.splitlines(), pairs)
+
+    assert list(rows) == [("hand", "skull"), ("foo", "bar")]
+    assert rows[("foo", "bar")]['Path'] == 'Path not found'
+
+
+def test_lcs_term_and_cui_inputs(umls_sim):
+    pairs = [("hand", "skull"), ("C0018563", "C0037303")]
+    df = umls_sim._parse_least_common_subsumer_output(LCS_OUTPUT.splitlines(), pairs)
+
+    assert list(df['LCS']) == ['Anatomy (C0002807)', 'Anatomy (C0002807)']
+    assert list(df['CUI 1']) == ['C0018563', 'C0018563']
+    assert list(df['Min Depth']) == ['5', '5']
+    assert list(df['Max Depth']) == ['6', '6']
+
+
+def test_lcs_pairs_without_subsumer_are_omitted(umls_sim):
+    pairs = [("foo", "bar"), ("hand", "skull"), ("foo", "bar"), ("hand", "skull")]
+    df = umls_sim._parse_least_common_subsumer_output(LCS_OUTPUT.splitlines(), pairs)
+
+    assert list(zip(df['Term 1'], df['Term 2'])) == [("hand", "skull"), ("hand", "skull")]
+
+
+def test_lcs_rows_tell_no_subsumer_from_no_answer(umls_sim):
+    pairs = [("hand", "skull"), ("foo", "bar"), ("C0000001", "C0000002")]
+    rows = umls_sim._least_common_subsumer_rows(LCS_OUTPUT.splitlines(), pairs)
+
+    assert rows[("hand", "skull")]['LCS'] == 'Anatomy (C0002807)'
+    assert rows[("foo", "bar")] is _NO_ROW
+    assert ("C0000001", "C0000002") not in rows
+
+
+def test_multi_similarity_matches_lines_to_pairs(umls_sim):
+    # The driver prints measure<>score<>cui1<>cui2<>input1<>input2; the failed pair gets a -1
+    # score, one pair got no line at all and the lines are not in submission order
+    lines = [
+        "lch<>-1.0000<>C0018563<>C0035078<>C0018563<>C0035078",
+        "lch<>2.0794<>hand(C0018563)<>skull(C0037303)<>hand<>skull",
+        "wup<>0.5000<>hand(C0018563)<>skull(C0037303)<>hand<>skull",
+        "wup<>-1.0000<>C0018563<>C0035078<>C0018563<>C0035078",
+        "wup<>-1.0000<>foo<>bar<>foo<>bar",
+    ]
+    pair_lines = ["hand<>skull", "C0018563<>C0035078", "foo<>bar"]
+    results = dict(umls_sim._parse_multi_similarity_output(lines, ['lch', 'wup'], pair_lines))
+
+    assert [row[3] for row in results['lch']] == ['2.0794', '-1.0000', 'N/A']
+    assert [row[3] for row in results['wup']] == ['0.5000', '-1.0000', '-1.0000']
+    assert results['lch'][0] == ['lch', 'hand(C0018563)', 'skull(C0037303)', '2.0794']
+    assert results['lch'][2] == ['lch', 'foo', 'bar', 'N/A']
+
+
+def test_multi_similarity_ignores_unrequested_measures_and_noise(umls_sim):
+    lines = ["", "WARNING: something", "path<>0.2500<>a(C0000001)<>b(C0000002)<>a<>b"]
+    results = umls_sim._parse_multi_similarity_output(lines, ['lch'], ["a<>b"])
+
+    assert results == [('lch', [['lch', 'a', 'b', 'N/A']])]
+
+
+def test_similarity_results_are_keyed_by_submitted_pair(umls_sim):
+    lines = ["lch<>2.0794<>hand(C0018563)<>skull(C0037303)<>hand<>skull"]
+    pairs = [(" hand", "skull"), ("foo", "bar")]
+    results = umls_sim._similarity_results(lines, ['lch', 'wup'], 4, pairs)
+
+    assert results == {('SIM', 'lch', 4, ' hand', 'skull'): ['lch', 'hand(C0018563)', 'skull(C0037303)', '2.0794']}
+
+
+def test_expanded_similarity_results_repeat_pairs(umls_sim):
+    lines = [
+        "lch<>2.0794<>hand(C0018563)<>skull(C0037303)<>hand<>skull",
+        "lch<>-1.0000<>foo<>bar<>foo<>bar",
+    ]
+    unique_pairs = [("hand", "skull"), ("foo", "bar")]
+    cui_pairs = [("hand", "skull"), ("foo", "bar"), ("hand", "skull")]
+    all_results = umls_sim._parse_multi_similarity_output(lines, ['lch'], ["hand<>skull", "foo<>bar"])
+    df = umls_sim.combine_similarity_results(
+        umls_sim._expand_similarity_results(all_results, unique_pairs, cui_pairs), cui_pairs)
+
+    assert list(df['lch']) == ['2.0794', '-1.0000', '2.0794']
+    assert list(df['CUI 1']) == ['C0018563', 'N/A', 'C0018563']
+
+
+def _similarity_frame(rows):
+    return pd.DataFrame(rows, columns=['Term 1', 'Term 2', 'CUI 1', 'CUI 2', 'lch'])
+
+
+def _path_frame(rows):
+    return pd.DataFrame(rows, columns=['Term 1', 'Term 2', 'CUI 1', 'CUI 2', 'Path Length', 'Path'])
+
+
+def test_merge_results_repeated_pairs_do_not_multiply(umls_sim):
+    key = ['hand', 'skull', 'C0018563', 'C0037303']
+    results = {
+        'similarity': _similarity_frame([key + ['2.0794'], key + ['2.0794']]),
+        'shortest_path': _path_frame([key + ['3', 'C0018563 => C0002807 => C0037303']] * 2),
+    }
+    merged = umls_sim.merge_results(results)
+
+    assert len(merged) == 2
+    assert list(merged.columns) == ['Term 1', 'Term 2', 'CUI 1', 'CUI 2', 'lch', 'Path Length', 'Path']
+
+
+def test_merge_results_keeps_pairs_missing_from_one_result(umls_sim):
+    hand = ['hand', 'skull', 'C0018563', 'C0037303']
+    foo = ['foo', 'bar', 'N/A', 'N/A']
+    lcs = pd.DataFrame([hand + ['Anatomy (C0002807)', '5', '6']],
+                       columns=['Term 1', 'Term 2', 'CUI 1', 'CUI 2', 'LCS', 'Min Depth', 'Max Depth'])
+    merged = umls_sim.merge_results({
+        'similarity': _similarity_frame([hand + ['2.0794'], foo + ['-1.0000']]),
+        'lcs': lcs,
+    })
+
+    assert len(merged) == 2
+    by_term = merged.set_index('Term 1')
+    assert by_term.loc['hand', 'LCS'] == 'Anatomy (C0002807)'
+    assert pd.isna(by_term.loc['foo', 'LCS'])
+
+
+def test_merge_results_single_and_empty(umls_sim):
+    df = _similarity_frame([['hand', 'skull', 'C0018563', 'C0037303', '2.0794']])
+
+    assert umls_sim.merge_results({'similarity': df}) is df
+    assert umls_sim.merge_results({}).empty
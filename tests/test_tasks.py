@@ -0,0 +1,117 @@
+"""
+Tests for how `run_concurrently` groups tasks and how `run_fused_tasks` splits them into batches.
+
+`_run_command_batches` is stubbed with canned driver output, so no Perl is needed.
+"""
+import pytest
+
+from PyUMLS_Similarity import PyUMLS_Similarity
+
+MYSQL_INFO = {
+    "database": "umls",
+    "username": "user",
+    "password": "password",
+    "hostname": "localhost",
+    "socket": "MYSQL",
+}
+
+PAIRS = [("hand", "skull"), ("foo", "bar"), ("hand", "skull")]
+
+
+def _answer(command):
+    op, *args = command.split('<>')
+    if op == 'SIM':
+        measure, _, cui1, cui2 = args
+        return [f"{measure}<>0.5000<>{cui1}(C0018563)<>{cui2}(C0037303)<>{cui1}<>{cui2}"]
+    cui1, cui2 = args
+    if op == 'PATH':
+        return [f"The shortest path (length: 3) between {cui1} (C0018563) and {cui2} (C0037303):",
+                "  => C0018563 (Hand) C0002807 (Anatomy) C0037303 (Skull)"]
+    return [f"There is not a least common subsumer between {cui1} and {cui2} given the current view of the UMLS."]
+
+
+@pytest.fixture
+def batches_run(monkeypatch):
+    batches_run = []
+
+    def run_command_batches(self, batches):
+        batches_run.append(batches)
+        return [[line for command in commands for line in _answer(command)] for commands in batches]
+
+    monkeypatch.setattr(PyUMLS_Similarity, "_run_command_batches", run_command_batches)
+    return batches_run
+
+
+@pytest.fixture
+def umls_sim():
+    # With persistent=True single tasks also go through _run_command_batches
+    return PyUMLS_Similarity(MYSQL_INFO, persistent=True)
+
+
+def test_run_fused_tasks_sends_one_batch_per_task(umls_sim, batches_run):
+    results = umls_sim.run_fused_tasks([
+        {'function': 'similarity', 'arguments': (PAIRS, ['lch', 'wup'])},
+        {'function': 'shortest_path', 'arguments': PAIRS},
+        {'function': 'lcs', 'arguments': PAIRS},
+    ])
+
+    assert batches_run == [[
+        ['SIM<>lch<>4<>hand<>skull', 'SIM<>lch<>4<>foo<>bar', 'SIM<>wup<>4<>hand<>skull', 'SIM<>wup<>4<>foo<>bar'],
+        ['PATH<>hand<>skull', 'PATH<>foo<>bar'],
+        ['LCS<>hand<>skull', 'LCS<>foo<>bar'],
+    ]]
+    assert list(results['similarity']['wup']) == ['0.5000'] * 3
+    assert list(results['shortest_path']['Path']) == ['C0018563 => C0002807 => C0037303'] * 3
+    assert results['lcs'].empty
+
+
+def test_run_fused_tasks_reads_and_fills_the_cache(umls_sim, batches_run):
+    umls_sim.run_fused_tasks([{'function': 'similarity', 'arguments': (PAIRS[:1], ['lch'])},
+                              {'function': 'shortest_path', 'arguments': PAIRS[:1]}])
+    umls_sim.run_fused_tasks([{'function': 'similarity', 'arguments': (PAIRS, ['lch'])},
+                              {'function': 'shortest_path', 'arguments': PAIRS}])
+    umls_sim.find_shortest_path(PAIRS)
+
+    assert batches_run[1] == [['SIM<>lch<>4<>foo<>bar'], ['PATH<>foo<>bar']]
+    assert len(batches_run) == 2
+
+
+def test_run_concurrently_fuses_tasks_on_the_same_pairs(umls_sim, batches_run):
+    other_pairs = [("C0018563", "C0037303")]
+    merged = umls_sim.run_concurrently([
+        {'function': 'similarity', 'arguments': (PAIRS, ['lch'])},
+        {'function': 'shortest_path', 'arguments': PAIRS},
+        {'function': 'lcs', 'arguments': other_pairs},
+    ])
+
+    # One run for the two tasks on PAIRS, one for the LCS task on its own
+    assert sorted(len(batches) for batches in batches_run) == [1, 2]
+    assert list(merged.columns) == ['Term 1', 'Term 2', 'CUI 1', 'CUI 2', 'lch', 'Path Length', 'Path',
+                                    'LCS', 'Min Depth', 'Max Depth']
+
+
+def test_similarity_without_forcerun_is_not_fused(umls_sim):
+    with_forcerun = {'function': 'similarity', 'arguments': (PAIRS, ['lch'], 4, True)}
+    without_forcerun = {'function': 'similarity', 'arguments': (PAIRS, ['lch'], 4, False)}
+
+    assert umls_sim._task_pairs_key(with_forcerun) == tuple(PAIRS)
+    assert umls_sim._task_pairs_key(without_forcerun) is None
+
+
+def test_failed_fused_run_falls_back_to_single_tasks(umls_sim, monkeypatch):
+    def run_command_batches(self, batches):
+        raise RuntimeError("Perl died")
+
+    def find_shortest_path(self, cui_pairs, forcerun=True):
+        raise RuntimeError("no path")
+
+    monkeypatch.setattr(PyUMLS_Similarity, "_run_command_batches", run_command_batches)
+    monkeypatch.setattr(PyUMLS_Similarity, "similarity", lambda self, *args: 'similarity frame')
+    monkeypatch.setattr(PyUMLS_Similarity, "find_shortest_path", find_shortest_path)
+    results, errors = umls_sim._run_task_group([
+        {'function': 'similarity', 'arguments': (PAIRS, ['lch'])},
+        {'function': 'shortest_path', 'arguments': PAIRS},
+    ])
+
+    assert results == {'similarity': 'similarity frame'}
+    assert list(errors) == ['shortest_path']
@@ -0,0 +1,115 @@
+"""
+Tests for the persistent worker pool and the one-shot batch run.
+
+A small Python script stands in for the Perl driver: it answers every command
+with an OK<>command line, prints __END__ for END and exits with status 3 on DIE.
+"""
+import subprocess
+import sys
+import threading
+
+import pytest
+
+from PyUMLS_Similarity import PyUMLS_Similarity
+
+MYSQL_INFO = {
+    "database": "umls",
+    "username": "user",
+    "password": "password",
+    "hostname": "localhost",
+    "socket": "MYSQL",
+}
+
+FAKE_WORKER = r"""
+import sys
+for line in sys.stdin:
+    line = line.rstrip("\n")
+    if line == "END":
+        sys.stdout.write("__END__\n")
+        sys.stdout.flush()
+    elif line == "DIE":
+        sys.exit(3)
+    else:
+        sys.stdout.write("OK<>" + line + "\n")
+"""
+
+
+@pytest.fixture
+def fake_worker(tmp_path, monkeypatch):
+    script = tmp_path / "fake_worker.py"
+    script.write_text(FAKE_WORKER)
+    started = []
+    popen = subprocess.Popen
+
+    # Run the fake worker in place of Perl, ignoring the Strawberry Perl working directory
+    def fake_popen(args, cwd=None, **kwargs):
+        started.append(args)
+        return popen([sys.executable, str(script)], **kwargs)
+
+    monkeypatch.setattr(subprocess, "Popen", fake_popen)
+    return started
+
+
+@pytest.fixture
+def umls_sim(tmp_path):
+    umls_sim = PyUMLS_Similarity(MYSQL_INFO, work_directory=str(tmp_path), persistent=True)
+    yield umls_sim
+    umls_sim.close()
+
+
+def test_worker_request_returns_the_batch_lines(umls_sim, fake_worker):
+    assert umls_sim._worker_request(["PATH<>a<>b", "LCS<>c<>d"]) == ["OK<>PATH<>a<>b", "OK<>LCS<>c<>d"]
+    assert umls_sim._worker_request(["PATH<>e<>f"]) == ["OK<>PATH<>e<>f"]
+
+    # The second request reuses the running worker
+    assert len(fake_worker) == 1
+
+
+def test_worker_request_large_batch_does_not_deadlock(umls_sim, fake_worker):
+    # Far more than a pipe buffer in both directions
+    commands = [f"SIM<>lch<>4<>C{i:07d}<>C0037303" for i in range(100000)]
+    lines = umls_sim._worker_request(commands)
+
+    assert len(lines) == len(commands)
+    assert lines[-1] == "OK<>" + commands[-1]
+
+
+def test_worker_pool_serves_concurrent_requests(tmp_path, fake_worker):
+    replies = {}
+    umls_sim = PyUMLS_Similarity(MYSQL_INFO, work_directory=str(tmp_path), persistent=2)
+
+    def request(i):
+        replies[i] = umls_sim._worker_request([f"PATH<>{i}<>{j}" for j in range(1000)])
+
+    threads = [threading.Thread(target=request, args=(i,)) for i in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    umls_sim.close()
+
+    assert all(replies[i] == [f"OK<>PATH<>{i}<>{j}" for j in range(1000)] for i in range(6))
+    assert len(fake_worker) <= 2
+
+
+def test_dead_worker_raises_and_is_replaced(umls_sim, fake_worker):
+    with pytest.raises(RuntimeError):
+        umls_sim._worker_request(["DIE"])
+    assert umls_sim._worker_request(["PATH<>a<>b"]) == ["OK<>PATH<>a<>b"]
+
+    assert len(fake_worker) == 2
+
+
+def test_run_command_batches_splits_one_shot_output(tmp_path, fake_worker):
+    umls_sim = PyUMLS_Similarity(MYSQL_INFO, work_directory=str(tmp_path))
+    batches = [["SIM<>lch<>4<>a<>b"], [], ["PATH<>a<>b", "PATH<>c<>d"]]
+
+    assert umls_sim._run_command_batches(batches) == [
+        ["OK<>SIM<>lch<>4<>a<>b"], [], ["OK<>PATH<>a<>b", "OK<>PATH<>c<>d"]]
+
+
+def test_run_command_batches_raises_on_exit_status(tmp_path, fake_worker):
+    umls_sim = PyUMLS_Similarity(MYSQL_INFO, work_directory=str(tmp_path))
+
+    with pytest.raises(RuntimeError, match="status 3"):
+        umls_sim._run_command_batches([["PATH<>a<>b"], ["DIE"]])